@@ -1,12 +1,32 @@
 from typing import Optional
 
-from fastapi import APIRouter, Body, Request
+from fastapi import APIRouter, Body, HTTPException, Request, status
+
+from api.utils.cache import cache_stats, invalidate, local_cache
 
 router = APIRouter(
     prefix="/cache",
     tags=["Cache"],
 )
 
+# upstream session IDs are shared by the workers through Redis, they must never be
+# read or replaced through this router
+PRIVATE_KEY_SUFFIX = ":sid"
+
+
+def _is_private_key(key: str | bytes) -> bool:
+    if isinstance(key, bytes):
+        key = key.decode()
+    return key.endswith(PRIVATE_KEY_SUFFIX)
+
+
+def _check_key(key: str) -> None:
+    if _is_private_key(key):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Cache key {key} is private",
+        )
+
 
 @router.get("/", tags=["Ping"])
 async def get_cache_health(request: Request):
@@ -17,15 +37,37 @@ async def get_cache_health(request: Request):
     return {"status": "ok" if status else "error"}
 
 
+@router.get("/stats/")
+async def get_cache_stats(request: Request):
+    return {
+        "l1": {
+            "hits": cache_stats["l1"]["hits"],
+            "misses": cache_stats["l1"]["misses"],
+            "entries": len(local_cache),
+            "bytes": local_cache.size,
+        },
+        "l2": {
+            "hits": cache_stats["l2"]["hits"],
+            "misses": cache_stats["l2"]["misses"],
+        },
+    }
+
+
 @router.get("/get/")
 async def get_cache_keys(request: Request):
     keys = await request.app.state.redis.keys("*")
-    return {"keys": keys}
+    return {"keys": [key for key in keys if not _is_private_key(key)]}
 
 
 @router.get("/get/{key}/")
 async def get_cache_value(key: str, request: Request):
-    value = await request.app.state.redis.get(key)
+    _check_key(key)
+    redis = request.app.state.redis
+    # indexes such as the NAS folder sizes are kept in hashes
+    if await redis.type(key) == b"hash":
+        value = await redis.hgetall(key)
+    else:
+        value = await redis.get(key)
     return {"key": key, "value": value}
 
 
@@ -33,13 +75,17 @@ async def get_cache_value(key: str, request: Request):
 async def set_cache_value(
     request: Request, key: str, value: Optional[str] = Body(None)
 ):
+    _check_key(key)
     await request.app.state.redis.set(key, value)
+    await invalidate(request.app.state.redis, key)
     return {"key": key, "value": value}
 
 
 @router.delete("/delete/{key}/")
 async def delete_cache_value(key: str, request: Request):
+    _check_key(key)
     await request.app.state.redis.delete(key)
+    await invalidate(request.app.state.redis, key)
     return
 
 
@@ -47,5 +93,8 @@ async def delete_cache_value(key: str, request: Request):
 async def delete_cache_keys(request: Request):
     keys = await request.app.state.redis.keys("*")
     for key in keys:
+        if _is_private_key(key):
+            continue
         await request.app.state.redis.delete(key)
+    await invalidate(request.app.state.redis)
     return
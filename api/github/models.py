@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class RepoModel(BaseModel):
@@ -28,3 +28,14 @@ class EventsResponseModel(BaseModel):
     events_seen: dict[str, int]
     repos_seen: list[RepoModel]
     contributions: ContributionsModel
+
+
+class EventStoreModel(BaseModel):
+    """Events kept across refreshes (newest first) with their running aggregates."""
+
+    events: list[EventModel] = []
+    events_seen: dict[str, int] = {}
+    # repo name -> number of stored events that count the repo as seen
+    repo_refs: dict[str, int] = {}
+    repos_seen: dict[str, RepoModel] = {}
+    contributions: ContributionsModel = Field(default_factory=ContributionsModel)
@@ -1,87 +1,202 @@
+import asyncio
+import json
 import logging
+from datetime import datetime, timedelta, timezone
 
-import requests
+import httpx
 from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
 
 from api.config import Settings
 from api.github.models import (
-    ContributionsModel,
     EventModel,
     EventsResponseModel,
+    EventStoreModel,
     RepoModel,
 )
 from api.utils.cache import cache
 
 logger = logging.getLogger(__name__)
 
+GITHUB_EVENTS_PAGES = 3
+GITHUB_EVENTS_PER_PAGE = 100
+# every event seen so far, so a refresh only has to fetch the new ones
+GITHUB_EVENTS_STORE_KEY = "github:events:store"
+GITHUB_EVENTS_MAX = GITHUB_EVENTS_PAGES * GITHUB_EVENTS_PER_PAGE
+# the events API only returns events from this window, older ones are dropped
+GITHUB_EVENTS_MAX_AGE = timedelta(days=90)
+# raw events of each page with their validators, so unchanged pages get a 304 that
+# does not count against the rate limit
+GITHUB_EVENTS_PAGE_KEY = "github:events:page:{page}"
+GITHUB_EVENTS_PAGE_TTL = 60 * 60 * 24
 
-@cache("github:events", EventsResponseModel, ttl=60 * 60)
-async def retrieve_events(request: Request) -> EventsResponseModel:
-    url = f"https://api.github.com/users/{Settings.GITHUB_USERNAME}/events/public?per_page=100"
 
+async def _retrieve_events_page(request: Request, url: str, page: int) -> list[dict]:
+    redis = request.app.state.redis
+    page_key = GITHUB_EVENTS_PAGE_KEY.format(page=page)
+    cached_page = await redis.get(page_key)
+    cached_page = json.loads(cached_page) if cached_page is not None else None
+
+    headers = {}
+    if cached_page is not None:
+        if cached_page.get("etag"):
+            headers["If-None-Match"] = cached_page["etag"]
+        if cached_page.get("last_modified"):
+            headers["If-Modified-Since"] = cached_page["last_modified"]
+
+    r = await request.app.state.http.get(f"{url}&page={page}", headers=headers)
+    if r.status_code == status.HTTP_304_NOT_MODIFIED and cached_page is not None:
+        return cached_page["events"]
+
+    raw_data = r.json()
+    if "message" in raw_data and "API rate limit exceeded" in raw_data["message"]:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="GitHub API Rate Limit Exceeded",
+        )
+
+    await redis.set(
+        page_key,
+        json.dumps(
+            {
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+                "events": raw_data,
+            }
+        ),
+        ex=GITHUB_EVENTS_PAGE_TTL,
+    )
+    return raw_data
+
+
+def _parse_event(event: dict) -> EventModel:
+    return EventModel(
+        id=event["id"],
+        type=event["type"],
+        commits=(
+            len(event["payload"]["commits"]) if "commits" in event["payload"] else 0
+        ),
+        repo=RepoModel(
+            id=event["repo"]["id"],
+            name=event["repo"]["name"],
+            url=event["repo"]["url"],
+        ),
+        created_at=event["created_at"],
+    )
+
+
+def _take_new_events(
+    raw_data: list[dict], known_ids: set[str]
+) -> tuple[list[EventModel], bool]:
+    """Parse events up to the first known one, returns whether pagination is done."""
     events: list[EventModel] = []
-    events_seen: dict[str, int] = {}
-    repos_seen: set[RepoModel] = set()
-    contributions = ContributionsModel()
+    for event in raw_data:
+        if event["id"] in known_ids:
+            return events, True
+        # events shift between pages while paginating, don't count them twice
+        known_ids.add(event["id"])
+        events.append(_parse_event(event))
+    return events, len(raw_data) < GITHUB_EVENTS_PER_PAGE
+
+
+def _count_event(store: EventStoreModel, event: EventModel, sign: int) -> None:
+    """Add an event to (``sign=1``) or remove it from (``sign=-1``) the aggregates."""
+    events_seen = store.events_seen.get(event.type, 0) + sign
+    if events_seen:
+        store.events_seen[event.type] = events_seen
+    else:
+        store.events_seen.pop(event.type, None)
+
+    if event.type != "ForkEvent" and event.type != "WatchEvent":
+        repo_refs = store.repo_refs.get(event.repo.name, 0) + sign
+        if repo_refs:
+            store.repo_refs[event.repo.name] = repo_refs
+            store.repos_seen[event.repo.name] = event.repo
+        else:
+            store.repo_refs.pop(event.repo.name, None)
+            store.repos_seen.pop(event.repo.name, None)
+
+    if event.repo.name.startswith(Settings.GITHUB_USERNAME):
+        # a push counts its commits (possibly none), any other event counts once
+        weight = event.commits if event.type == "PushEvent" else 1
+        store.contributions.own_projects += sign * weight
+    elif event.type.startswith("Issue") or event.type.startswith("Pull"):
+        store.contributions.oss_projects += sign
+
+
+def _trim_events(store: EventStoreModel, now: datetime) -> bool:
+    """Drop events past the cap or GitHub's window, returns whether any were."""
+    cutoff = now - GITHUB_EVENTS_MAX_AGE
+    # events are newest first
+    keep = min(len(store.events), GITHUB_EVENTS_MAX)
+    while keep and datetime.fromisoformat(store.events[keep - 1].created_at) < cutoff:
+        keep -= 1
+    for event in store.events[keep:]:
+        _count_event(store, event, -1)
+    trimmed = keep < len(store.events)
+    del store.events[keep:]
+    return trimmed
+
+
+async def _load_event_store(request: Request) -> EventStoreModel:
+    cached_store = await request.app.state.redis.get(GITHUB_EVENTS_STORE_KEY)
+    if cached_store is None:
+        return EventStoreModel()
+    try:
+        return EventStoreModel.model_validate_json(cached_store)
+    except ValidationError as e:
+        logger.warning(f"Error parsing GitHub event store, rebuilding it: {e}")
+        return EventStoreModel()
+
+
+@cache(
+    "github:events",
+    EventsResponseModel,
+    ttl=60 * 60,
+    stale_ttl=60 * 60,
+    lock_ttl=30,
+)
+async def retrieve_events(request: Request) -> EventsResponseModel:
+    url = f"https://api.github.com/users/{Settings.GITHUB_USERNAME}/events/public?per_page={GITHUB_EVENTS_PER_PAGE}"
 
     try:
-        for i in range(3):
-            r = requests.get(f"{url}&page={i + 1}")
-            raw_data = r.json()
-
-            if (
-                "message" in raw_data
-                and "API rate limit exceeded" in raw_data["message"]
-            ):
-                raise HTTPException(
-                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                    detail="GitHub API Rate Limit Exceeded",
-                )
-
-            for event in raw_data:
-                event_model = EventModel(
-                    id=event["id"],
-                    type=event["type"],
-                    commits=(
-                        len(event["payload"]["commits"])
-                        if "commits" in event["payload"]
-                        else 0
-                    ),
-                    repo=RepoModel(
-                        id=event["repo"]["id"],
-                        name=event["repo"]["name"],
-                        url=event["repo"]["url"],
-                    ),
-                    created_at=event["created_at"],
-                )
-                events.append(event_model)
-                events_seen[event["type"]] = events_seen.get(event["type"], 0) + 1
-                if event["type"] != "ForkEvent" and event["type"] != "WatchEvent":
-                    repos_seen.add(
-                        RepoModel(
-                            id=event["repo"]["id"],
-                            name=event["repo"]["name"],
-                            url=event["repo"]["url"],
-                        )
-                    )
-                if event["repo"]["name"].startswith(Settings.GITHUB_USERNAME):
-                    contributions.own_projects += (
-                        len(event["payload"]["commits"])
-                        if "commits" in event["payload"]
-                        else 1
-                    )
-                elif event["type"].startswith("Issue") or event["type"].startswith(
-                    "Pull"
-                ):
-                    contributions.oss_projects += 1
+        store = await _load_event_store(request)
+        known_ids = {event.id for event in store.events}
+
+        # Only fetch until the first event already in the store
+        new_events, done = _take_new_events(
+            await _retrieve_events_page(request, url, 1), known_ids
+        )
+        if not done:
+            pages = await asyncio.gather(
+                *[
+                    _retrieve_events_page(request, url, page)
+                    for page in range(2, GITHUB_EVENTS_PAGES + 1)
+                ]
+            )
+            for raw_data in pages:
+                page_events, done = _take_new_events(raw_data, known_ids)
+                new_events += page_events
+                if done:
+                    break
+
+        for event in new_events:
+            _count_event(store, event, 1)
+        store.events = new_events + store.events
+        # an inactive account still loses events as they age out of the window
+        trimmed = _trim_events(store, datetime.now(timezone.utc))
+        if new_events or trimmed:
+            await request.app.state.redis.set(
+                GITHUB_EVENTS_STORE_KEY, store.model_dump_json()
+            )
 
         return EventsResponseModel(
-            events=events,
-            events_seen=events_seen,
-            repos_seen=list(repos_seen),
-            contributions=contributions,
+            events=store.events,
+            events_seen=store.events_seen,
+            repos_seen=list(store.repos_seen.values()),
+            contributions=store.contributions,
         )
-    except requests.exceptions.ConnectionError as e:
+    except httpx.TransportError as e:
         logger.error(e)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -15,4 +15,4 @@ router = APIRouter(
 
 @router.get("/events/", response_model=EventsResponseModel)
 async def get_events(request: Request):
-    return await retrieve_events(request)
+    return await retrieve_events.response(request)
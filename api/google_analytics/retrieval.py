@@ -1,65 +1,105 @@
 import json
+import logging
 from datetime import datetime, timedelta
 
-import pandas as pd
-from fastapi import Request
-from google.analytics.data_v1beta import BetaAnalyticsDataClient
+from fastapi import HTTPException, Request, status
+from google.analytics.data_v1beta import BetaAnalyticsDataAsyncClient
 from google.analytics.data_v1beta.types import (
     DateRange,
     Dimension,
     Metric,
     RunReportRequest,
 )
-from google.oauth2 import service_account
 
 from api.config import Settings
-from api.google_analytics.models import ActiveUsersPerDay
+from api.google_analytics.models import ActiveUsersDay, ActiveUsersPerDay
 from api.utils.cache import cache
 
+logger = logging.getLogger(__name__)
 
-@cache("ga:active_users_per_day", ActiveUsersPerDay, ttl=60 * 60)
+# daily active users by GA date (YYYYMMDD), days before the refresh window are final
+GA4_DAYS_KEY = "ga:active_users:days"
+# the last day included in GA4_DAYS_KEY
+GA4_SYNCED_UNTIL_KEY = "ga:active_users:synced_until"
+GA4_HISTORY_DAYS = 365
+# GA keeps processing the most recent days, query them again on every refresh
+GA4_REFRESH_DAYS = 3
+
+
+def create_ga4_client() -> BetaAnalyticsDataAsyncClient | None:
+    """Create the client shared by all requests, it keeps its channel and token.
+
+    Returns None, disabling Google Analytics, if the credentials are invalid.
+    """
+    try:
+        return BetaAnalyticsDataAsyncClient.from_service_account_info(
+            json.loads(Settings.GA4_CREDENTIALS)
+        )
+    except ValueError as e:
+        logger.error(f"Google Analytics disabled, invalid credentials: {e}")
+        return None
+
+
+@cache(
+    "ga:active_users_per_day", ActiveUsersPerDay, ttl=60 * 60, stale_ttl=60 * 60 * 24
+)
 async def retrieve_active_users_per_day(request: Request) -> ActiveUsersPerDay:
-    credentials_json = json.loads(Settings.GA4_CREDENTIALS)
-    credentials = service_account.Credentials.from_service_account_info(
-        credentials_json
-    )
+    client: BetaAnalyticsDataAsyncClient | None = request.app.state.ga4
+    if client is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Google Analytics Credentials Invalid",
+        )
     property_id = Settings.GA4_PROPERTY_ID
-    client = BetaAnalyticsDataClient(credentials=credentials)
+    redis = request.app.state.redis
+
+    # Only query the days that may still change, or the whole year on first run
+    today = datetime.now().date()
+    history_start = today - timedelta(days=GA4_HISTORY_DAYS)
+    query_start = history_start
+    synced_until = await redis.get(GA4_SYNCED_UNTIL_KEY)
+    if synced_until is not None and await redis.exists(GA4_DAYS_KEY):
+        refresh_start = datetime.strptime(synced_until.decode(), "%Y-%m-%d").date()
+        refresh_start -= timedelta(days=GA4_REFRESH_DAYS - 1)
+        query_start = max(history_start, refresh_start)
 
     api_request = RunReportRequest(
         property=f"properties/{property_id}",
         dimensions=[Dimension(name="date")],
         metrics=[Metric(name="activeUsers")],
-        date_ranges=[DateRange(start_date="365daysAgo", end_date="today")],
+        date_ranges=[
+            DateRange(start_date=query_start.strftime("%Y-%m-%d"), end_date="today")
+        ],
     )
 
-    response = client.run_report(api_request)
+    response = await client.run_report(api_request)
 
-    data = [
-        (row.dimension_values[0].value, int(row.metric_values[0].value))
+    # Merge the queried days into the stored series
+    queried_days = {
+        row.dimension_values[0].value: int(row.metric_values[0].value)
         for row in response.rows
-    ]
-
-    # Convert the data into a DataFrame
-    df = pd.DataFrame(data, columns=["date", "active_users"])
-
-    # Convert the date column to datetime
-    df["date"] = pd.to_datetime(df["date"], format="%Y%m%d")
-
-    # Create a date range for the last year
-    end_date = datetime.now().strftime("%Y-%m-%d")
-    start_date = datetime.strptime(end_date, "%Y-%m-%d") - timedelta(days=365)
-    date_range = pd.date_range(start_date, end_date)
+    }
+    if queried_days:
+        await redis.hset(GA4_DAYS_KEY, mapping=queried_days)
+    await redis.set(GA4_SYNCED_UNTIL_KEY, today.strftime("%Y-%m-%d"))
 
-    # Reindex the DataFrame to include all dates in the date range
-    df.set_index("date", inplace=True)
-    df = df.reindex(date_range, fill_value=0)
-
-    # Reset the index
-    df.reset_index(inplace=True)
-    df.rename(columns={"index": "date"}, inplace=True)
+    stored_days = {
+        day.decode(): int(active_users)
+        for day, active_users in (await redis.hgetall(GA4_DAYS_KEY)).items()
+    }
+    expired_days = [
+        day for day in stored_days if day < history_start.strftime("%Y%m%d")
+    ]
+    if expired_days:
+        await redis.hdel(GA4_DAYS_KEY, *expired_days)
 
-    # Convert the DataFrame to a list of dictionaries
-    data = df.to_dict("records")
+    # Zero-fill the days without any active users
+    days = (history_start + timedelta(days=i) for i in range(GA4_HISTORY_DAYS + 1))
+    per_day = [
+        ActiveUsersDay(
+            date=day, active_users=stored_days.get(day.strftime("%Y%m%d"), 0)
+        )
+        for day in days
+    ]
 
-    return ActiveUsersPerDay(per_day=data)
+    return ActiveUsersPerDay(per_day=per_day)
@@ -15,4 +15,4 @@ router = APIRouter(
 
 @router.get("/active_users/", response_model=ActiveUsersPerDay)
 async def get_active_users_per_day(request: Request):
-    return await retrieve_active_users_per_day(request)
+    return await retrieve_active_users_per_day.response(request)
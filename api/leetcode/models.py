@@ -36,3 +36,9 @@ class LCTopicsSolvedModel(BaseModel):
     advanced: list[LCTopicStatModel]
     intermediate: list[LCTopicStatModel]
     fundamental: list[LCTopicStatModel]
+
+
+class LCAllStatsModel(BaseModel):
+    solved: LCProblemsSolvedModel
+    languages: LCLanguagesResponse
+    topics: LCTopicsSolvedModel
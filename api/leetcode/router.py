@@ -3,11 +3,13 @@ import logging
 from fastapi import APIRouter, Request
 
 from api.leetcode.models import (
+    LCAllStatsModel,
     LCLanguagesResponse,
     LCProblemsSolvedModel,
     LCTopicsSolvedModel,
 )
 from api.leetcode.retrieval import (
+    retrieve_all,
     retrieve_languages,
     retrieve_problems_solved,
     retrieve_topics,
@@ -23,14 +25,19 @@ router = APIRouter(
 
 @router.get("/solved/", response_model=LCProblemsSolvedModel)
 async def get_problems_solved(request: Request):
-    return await retrieve_problems_solved(request)
+    return await retrieve_problems_solved.response(request)
 
 
 @router.get("/languages/", response_model=LCLanguagesResponse)
 async def get_problems_solved_per_language(request: Request):
-    return await retrieve_languages(request)
+    return await retrieve_languages.response(request)
 
 
 @router.get("/topics/", response_model=LCTopicsSolvedModel)
 async def get_problems_solved_per_topic(request: Request):
-    return await retrieve_topics(request)
+    return await retrieve_topics.response(request)
+
+
+@router.get("/all/", response_model=LCAllStatsModel)
+async def get_all_stats(request: Request):
+    return await retrieve_all.response(request)
@@ -1,29 +1,42 @@
+import asyncio
+import json
 import logging
 from contextlib import asynccontextmanager
 from itertools import product
 
+import httpx
 import redis.asyncio as redis
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
 
 from api.cache.router import router as cache_router
 from api.config import Settings
 from api.github.router import router as github_router
+from api.google_analytics.retrieval import create_ga4_client
 from api.google_analytics.router import router as google_analytics_router
 from api.leetcode.router import router as leetcode_router
 from api.monarchmoney.router import router as monarchmoney_router
 from api.nas.router import router as nas_router
 from api.npm.router import router as npm_router
 from api.pihole.router import router as pihole_router
+from api.plex.notifications import listen_for_plex_sessions
 from api.plex.router import router as plex_router
 from api.portfolio.router import router as portfolio_router
 from api.speedtest.router import router as speedtest_router
+from api.utils.cache import listen_for_invalidations, subscribe_to_updates
+from api.utils.upstream import UpstreamClient
+from api.utils.warmer import CacheWarmer
 
 logging.basicConfig(
     level=logging.INFO, format="%(levelname)s\t%(funcName)s.%(lineno)d\t%(message)s"
 )
 logger = logging.getLogger(__name__)
 
+# seconds between comments that keep idle SSE connections from timing out
+SSE_KEEPALIVE_INTERVAL = 15
+
 
 tags_metadata = [
     {
@@ -83,8 +96,30 @@ async def lifespan(app: FastAPI):
     # set up redis cache
     app.state.redis = redis.Redis(host="cache", port=6379, db=0)
     logger.info(f"Ping successful: {await app.state.redis.ping()}")
+    # keep the in-process cache coherent with other workers
+    invalidation_listener = asyncio.create_task(
+        listen_for_invalidations(app.state.redis)
+    )
+    # set up shared upstream http client, the DSM web server is easily overwhelmed
+    app.state.http = UpstreamClient(
+        host_limits={httpx.URL(Settings.NAS_API_BASE).host: 4},
+    )
+    # reuse one GA4 channel and access token for every report
+    app.state.ga4 = create_ga4_client()
+    # keep every requested cache key warm
+    warmer = CacheWarmer(app)
+    warmer_task = asyncio.create_task(warmer.run())
+    # push Plex play state changes into the cache instead of waiting for a poll
+    plex_listener = asyncio.create_task(listen_for_plex_sessions(app))
     yield
     # cleanup
+    plex_listener.cancel()
+    warmer_task.cancel()
+    await warmer.aclose()
+    invalidation_listener.cancel()
+    await app.state.http.aclose()
+    if app.state.ga4 is not None:
+        await app.state.ga4.transport.close()
     await app.state.redis.close()
 
 
@@ -124,6 +159,9 @@ api.add_middleware(
     allow_headers=["*"],
 )
 
+# large JSON payloads (accounts, events, daily series) compress well
+api.add_middleware(GZipMiddleware, minimum_size=1000)
+
 api.include_router(pihole_router)
 api.include_router(leetcode_router)
 api.include_router(github_router)
@@ -140,3 +178,36 @@ api.include_router(plex_router)
 @api.get("/", tags=["Diagnostics", "Ping"])
 def get_server_health(request: Request):
     return {"status": "ok", "root_path": request.scope.get("root_path")}
+
+
+async def stream_cache_updates(request: Request, keys: list[str]):
+    """Yield an SSE message with the new value of every matching cache update."""
+    with subscribe_to_updates() as updates:
+        while not await request.is_disconnected():
+            try:
+                cache_key = await asyncio.wait_for(
+                    updates.get(), timeout=SSE_KEEPALIVE_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if keys and not any(
+                cache_key == key or cache_key.startswith(f"{key}:") for key in keys
+            ):
+                continue
+            value = await request.app.state.redis.get(cache_key)
+            if value is None:
+                # deleted or a wildcard invalidation, nothing to push
+                continue
+            key = json.dumps(cache_key)
+            yield f'data: {{"key": {key}, "value": {value.decode()}}}\n\n'
+
+
+@api.get("/stream/", tags=["Cache"])
+async def get_cache_updates(request: Request, keys: list[str] = Query(default=[])):
+    """Stream cached values as they change, e.g. ``?keys=plex:sessions``."""
+    return StreamingResponse(
+        stream_cache_updates(request, keys),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
@@ -12,14 +12,6 @@ class MoneyPortfolio(BaseModel):
     performance: MoneyPerformance
 
 
-class MoneyPortfolioData(BaseModel):
-    portfolio: MoneyPortfolio
-
-
-class MoneyPortfolioIncoming(BaseModel):
-    data: MoneyPortfolioData
-
-
 class MoneyPortfolioOutgoing(MoneyPerformance):
     pass
 
@@ -69,3 +61,19 @@ class MoneyAccountsData(BaseModel):
 
 class MoneyAccountsResponse(BaseModel):
     data: MoneyAccountsData
+
+
+class MoneySummaryData(BaseModel):
+    # GraphQL nulls a field that failed, the other one can still be used
+    portfolio: Optional[MoneyPortfolio] = None
+    accountTypeSummaries: Optional[list[MoneyAccountSummary]] = None
+
+
+class MoneySummaryIncoming(BaseModel):
+    data: Optional[MoneySummaryData] = None
+    errors: list[dict] = []
+
+
+class MoneySummary(BaseModel):
+    portfolio: Optional[MoneyPortfolioOutgoing] = None
+    accounts: Optional[MoneyAccountsResponse] = None
@@ -1,136 +1,162 @@
-import json
+import asyncio
 import logging
 
-import requests
+import httpx
 from fastapi import HTTPException, Request, status
 
 from api.config import Settings
 from api.monarchmoney.models import (
+    MoneyAccountsData,
     MoneyAccountsResponse,
-    MoneyPortfolioIncoming,
     MoneyPortfolioOutgoing,
+    MoneySummary,
+    MoneySummaryIncoming,
 )
 from api.utils.cache import cache
 
 logger = logging.getLogger(__name__)
 
 MONARCH_GRAPHQL_ENDPOINT = "https://api.monarch.com/graphql"
+MONARCH_TTL = 60 * 5
+# a summary missing the portfolio or the accounts is retried sooner
+MONARCH_PARTIAL_TTL = 30
 
-
-@cache("money:portfolio", MoneyPortfolioOutgoing, ttl=60 * 5)
-async def retrieve_portfolio(request: Request) -> MoneyPortfolioOutgoing:
-    token = Settings.MONARCHMONEY_API_TOKEN
-    body = {
-        "operationName": "Web_GetInvestmentsDashboardCard",
-        "variables": {},
-        "query": """
-            query Web_GetInvestmentsDashboardCard {
-                portfolio {
-                    performance {
-                        totalValue
-                        oneDayChangeDollars
-                    }
-                }
+# the investments card and the accounts page in one round trip
+MONARCH_SUMMARY_QUERY = """
+    query Web_GetDashboardSummary {
+        portfolio {
+            performance {
+                totalValue
+                oneDayChangeDollars
+            }
+        }
+        accountTypeSummaries {
+            type {
+                name
+                display
+                group
             }
-        """,
+            accounts {
+                id
+                ...AccountsListFields
+            }
+            totalDisplayBalance
+        }
+    }
+    fragment AccountsListFields on Account {
+        id
+        syncDisabled
+        isHidden
+        isAsset
+        includeInNetWorth
+        type {
+            name
+            display
+        }
+        ...AccountListItemFields
+    }
+    fragment AccountListItemFields on Account {
+        id
+        displayName
+        displayBalance
+        signedBalance
+        updatedAt
+        syncDisabled
+        icon
+        logoUrl
+        isHidden
+        isAsset
+        includeInNetWorth
+        includeBalanceInNetWorth
+        institution {
+            id
+            ...InstitutionStatusTooltipFields
+        }
     }
+    fragment InstitutionStatusTooltipFields on Institution {
+        id
+        name
+    }
+"""
 
-    try:
-        r = requests.post(
-            MONARCH_GRAPHQL_ENDPOINT,
-            data=json.dumps(body),
-            headers={
-                "Authorization": f"Token {token}",
-                "Content-Type": "application/json",
-            },
-        )
-        r.raise_for_status()
-        data = MoneyPortfolioIncoming(**r.json())
-        return MoneyPortfolioOutgoing(
-            totalValue=data.data.portfolio.performance.totalValue,
-            oneDayChangeDollars=data.data.portfolio.performance.oneDayChangeDollars,
-        )
-    except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError) as e:
-        logger.error(e)
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=f"Connection to Monarch Money Refused: {e}",
-        )
 
+def _summary_ttl(summary: MoneySummary) -> int:
+    if summary.portfolio is None or summary.accounts is None:
+        return MONARCH_PARTIAL_TTL
+    return MONARCH_TTL
 
-@cache("money:accounts", MoneyAccountsResponse, ttl=60 * 5)
-async def retrieve_accounts(request: Request) -> MoneyAccountsResponse:
+
+@cache("money:summary", MoneySummary, ttl=MONARCH_TTL, result_ttl=_summary_ttl)
+async def retrieve_summary(request: Request) -> MoneySummary:
     token = Settings.MONARCHMONEY_API_TOKEN
     body = {
-        "operationName": "Web_GetAccountsPage",
+        "operationName": "Web_GetDashboardSummary",
         "variables": {},
-        "query": """
-            query Web_GetAccountsPage {
-                accountTypeSummaries {
-                    type {
-                        name
-                        display
-                        group
-                    }
-                    accounts {
-                        id
-                        ...AccountsListFields
-                    }
-                    totalDisplayBalance
-                }
-            }
-            fragment AccountsListFields on Account {
-                id
-                syncDisabled
-                isHidden
-                isAsset
-                includeInNetWorth
-                type {
-                    name
-                    display
-                }
-                ...AccountListItemFields
-            }
-            fragment AccountListItemFields on Account {
-                id
-                displayName
-                displayBalance
-                signedBalance
-                updatedAt
-                syncDisabled
-                icon
-                logoUrl
-                isHidden
-                isAsset
-                includeInNetWorth
-                includeBalanceInNetWorth
-                institution {
-                    id
-                    ...InstitutionStatusTooltipFields
-                }
-            }
-            fragment InstitutionStatusTooltipFields on Institution {
-                id
-                name
-            }
-        """,
+        "query": MONARCH_SUMMARY_QUERY,
     }
 
     try:
-        r = requests.post(
+        r = await request.app.state.http.post(
             MONARCH_GRAPHQL_ENDPOINT,
-            data=json.dumps(body),
+            json=body,
             headers={
                 "Authorization": f"Token {token}",
                 "Content-Type": "application/json",
             },
         )
         r.raise_for_status()
-
-        return MoneyAccountsResponse(**r.json())
-    except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError) as e:
+        data = MoneySummaryIncoming(**r.json())
+    except (httpx.TransportError, httpx.HTTPStatusError) as e:
         logger.error(e)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Connection to Monarch Money Refused: {e}",
         )
+    if data.errors:
+        logger.warning(f"Monarch Money summary returned errors: {data.errors}")
+
+    # either half may be missing, each endpoint only fails for its own half
+    summary = MoneySummary()
+    if data.data is not None and data.data.portfolio is not None:
+        summary.portfolio = MoneyPortfolioOutgoing(
+            totalValue=data.data.portfolio.performance.totalValue,
+            oneDayChangeDollars=data.data.portfolio.performance.oneDayChangeDollars,
+        )
+    if data.data is not None and data.data.accountTypeSummaries is not None:
+        summary.accounts = MoneyAccountsResponse(
+            data=MoneyAccountsData(
+                accountTypeSummaries=data.data.accountTypeSummaries,
+            )
+        )
+
+    # populate both endpoints from the same response so they agree
+    stores = []
+    if summary.portfolio is not None:
+        stores.append(retrieve_portfolio.store(request, summary.portfolio))
+    if summary.accounts is not None:
+        stores.append(retrieve_accounts.store(request, summary.accounts))
+    await asyncio.gather(*stores)
+    return summary
+
+
+def _missing(part: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=f"Monarch Money returned no {part}",
+    )
+
+
+@cache("money:portfolio", MoneyPortfolioOutgoing, ttl=MONARCH_TTL)
+async def retrieve_portfolio(request: Request) -> MoneyPortfolioOutgoing:
+    summary = await retrieve_summary(request)
+    if summary.portfolio is None:
+        raise _missing("portfolio")
+    return summary.portfolio
+
+
+@cache("money:accounts", MoneyAccountsResponse, ttl=MONARCH_TTL)
+async def retrieve_accounts(request: Request) -> MoneyAccountsResponse:
+    summary = await retrieve_summary(request)
+    if summary.accounts is None:
+        raise _missing("accounts")
+    return summary.accounts
@@ -1,8 +1,12 @@
 import logging
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request, Response, status
 
-from api.monarchmoney.models import MoneyAccountsResponse, MoneyPortfolioOutgoing
+from api.monarchmoney.models import (
+    MoneyAccount,
+    MoneyAccountsResponse,
+    MoneyPortfolioOutgoing,
+)
 from api.monarchmoney.retrieval import retrieve_accounts, retrieve_portfolio
 
 logger = logging.getLogger(__name__)
@@ -15,9 +19,37 @@ router = APIRouter(
 
 @router.get("/portfolio/", response_model=MoneyPortfolioOutgoing)
 async def get_portfolio(request: Request):
-    return await retrieve_portfolio(request)
+    return await retrieve_portfolio.response(request)
 
 
 @router.get("/accounts/", response_model=MoneyAccountsResponse)
-async def get_accounts(request: Request):
-    return await retrieve_accounts(request)
+async def get_accounts(request: Request, fields: str | None = None):
+    """Get account summaries, ``fields=id,displayName`` limits the account fields."""
+    if fields is None:
+        return await retrieve_accounts.response(request)
+
+    account_fields = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown_fields = account_fields - MoneyAccount.model_fields.keys()
+    if unknown_fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown account fields: {', '.join(sorted(unknown_fields))}",
+        )
+
+    # serialize only the requested fields straight from the cached model
+    accounts = await retrieve_accounts(request)
+    include = {
+        "data": {
+            "accountTypeSummaries": {
+                "__all__": {
+                    "type": True,
+                    "totalDisplayBalance": True,
+                    "accounts": {"__all__": account_fields},
+                }
+            }
+        }
+    }
+    return Response(
+        content=accounts.model_dump_json(include=include),
+        media_type="application/json",
+    )
@@ -3,26 +3,40 @@ from functools import wraps
 from typing import Annotated, Callable
 from urllib.parse import urlencode
 
-import requests
-import urllib3
+import httpx
 from fastapi import Depends, Request
 
 from api.config import Settings
+from api.nas.constants import NAS_SID_KEY, NAS_SID_TTL, SYNO_SESSION_ERROR_CODES
 from api.nas.models import (
     SynoApiInfoResponse,
     SynoApiLoginResponse,
-    SynoApiLogoutResponse,
     SynoApiVersions,
 )
 from api.utils.cache import cache
-
-urllib3.disable_warnings(category=urllib3.exceptions.InsecureRequestWarning)
+from api.utils.session import forget_shared_session, get_shared_session
+from api.utils.upstream import UpstreamClient
 
 logger = logging.getLogger(__name__)
 
 
+class SynoSessionError(Exception):
+    """The SID was rejected by DSM (expired, logged out or unknown)."""
+
+
+def syno_json(r: httpx.Response) -> dict:
+    """Parse a DSM response, raising SynoSessionError if the SID is no longer valid."""
+    r.raise_for_status()
+    data = r.json()
+    if not data.get("success", True):
+        code = data.get("error", {}).get("code")
+        if code in SYNO_SESSION_ERROR_CODES:
+            raise SynoSessionError(f"DSM session error {code}")
+    return data
+
+
 @cache("nas:versions", response_model=SynoApiVersions, ttl=60 * 60 * 24 * 7)
-async def retrieve_api_versions(*args, **kwargs) -> SynoApiVersions:
+async def retrieve_api_versions(request: Request) -> SynoApiVersions:
     params = {
         "api": "SYNO.API.Info",
         "version": 1,
@@ -30,7 +44,7 @@ async def retrieve_api_versions(*args, **kwargs) -> SynoApiVersions:
         "query": "SYNO.API.Auth,SYNO.FileStation.,SYNO.Core.System,SYNO.Core.System.Utilization",
     }
 
-    r = requests.post(
+    r = await request.app.state.http.post(
         Settings.NAS_API_BASE,
         data=params,
         verify=False,
@@ -49,7 +63,7 @@ async def retrieve_api_versions(*args, **kwargs) -> SynoApiVersions:
     return results
 
 
-def _nas_login(ds_auth_api_version: str) -> str:
+async def _nas_login(client: UpstreamClient, ds_auth_api_version: str) -> str:
     params = {
         "api": "SYNO.API.Auth",
         "version": ds_auth_api_version,
@@ -63,38 +77,33 @@ def _nas_login(ds_auth_api_version: str) -> str:
         "rememberme": 0,
         "session": "webui",
     }
-    r = requests.get(f"{Settings.NAS_API_BASE}?{urlencode(params)})", verify=False)
+    r = await client.get(f"{Settings.NAS_API_BASE}?{urlencode(params)}", verify=False)
     r.raise_for_status()
     data = SynoApiLoginResponse(**r.json())
     return data.data.sid
 
 
-def _nas_logout(ds_auth_api_version: str, sid: str) -> None:
-    params = {
-        "api": "SYNO.API.Auth",
-        "version": ds_auth_api_version,
-        "method": "logout",
-        "sid": sid,
-    }
-    r = requests.get(f"{Settings.NAS_API_BASE}?{urlencode(params)}", verify=False)
-    r.raise_for_status()
-    SynoApiLogoutResponse(**r.json())
+async def get_nas_sid(request: Request, versions: SynoApiVersions) -> str:
+    """Return the shared DSM SID, logging in only if no worker holds a valid one."""
+
+    async def login() -> tuple[str, int]:
+        sid = await _nas_login(request.app.state.http, versions.ds_auth_api_version)
+        return sid, NAS_SID_TTL
+
+    return await get_shared_session(request, NAS_SID_KEY, login)
 
 
 async def _nas_session(request: Request):
     versions = await retrieve_api_versions(request)
-    sid = _nas_login(versions.ds_auth_api_version)
-    try:
-        yield sid, versions.ds_filestation_api_version
-    finally:
-        _nas_logout(versions.ds_auth_api_version, sid)
+    sid = await get_nas_sid(request, versions)
+    yield sid, versions.ds_filestation_api_version
 
 
 def nas_session(func: Callable) -> Callable:
     @wraps(func)
     async def wrapper(request: Request, *args, **kwargs):
         versions = await retrieve_api_versions(request)
-        sid = _nas_login(versions.ds_auth_api_version)
+        sid = await get_nas_sid(request, versions)
         try:
             return await func(
                 request=request,
@@ -103,8 +112,17 @@ def nas_session(func: Callable) -> Callable:
                 *args,
                 **kwargs,
             )
-        finally:
-            _nas_logout(versions.ds_auth_api_version, sid)
+        except SynoSessionError as e:
+            logger.info(f"NAS session expired ({e}), logging in again")
+            await forget_shared_session(request, NAS_SID_KEY, sid)
+            sid = await get_nas_sid(request, versions)
+            return await func(
+                request=request,
+                sid=sid,
+                versions=versions,
+                *args,
+                **kwargs,
+            )
 
     return wrapper
 
@@ -0,0 +1,33 @@
+# DSM error codes meaning the SID is no longer usable and a new login is needed
+# 106: session timeout, 107: session interrupted by duplicate login, 119: SID not found
+SYNO_SESSION_ERROR_CODES = {106, 107, 119}
+
+# the SID is shared by all workers through Redis
+NAS_SID_KEY = "nas:sid"
+NAS_SID_TTL = 60 * 30
+
+# system info missing a section is only cached briefly so the next poll retries it
+NAS_SYSTEM_TTL = 60
+NAS_SYSTEM_PARTIAL_TTL = 5
+
+# last measured size of each folder, keyed by path in a Redis hash
+NAS_FOLDER_SIZE_INDEX_KEY = "nas:folder_sizes"
+# a folder's mtime only changes with its direct children, so changes deeper in the
+# tree are picked up by re-measuring indexed sizes older than this
+NAS_FOLDER_SIZE_MAX_AGE = 60 * 60 * 24
+# how many DirSize tasks may run on the NAS at the same time
+NAS_FOLDER_SIZE_CONCURRENCY = 8
+# stop waiting for a DirSize task after this many seconds, the task keeps running
+# on the NAS and is polled again by the next refresh
+NAS_FOLDER_SIZE_TIMEOUT = 60
+# DirSize tasks left running, keyed by path in a Redis hash
+NAS_FOLDER_SIZE_TASKS_KEY = "nas:folder_size_tasks"
+# give up on a task left running for longer than this and start over
+NAS_FOLDER_SIZE_TASK_MAX_AGE = 60 * 60
+# first poll at this fraction of the previous duration, so it never waits too long
+NAS_FOLDER_SIZE_FIRST_POLL_FRACTION = 0.5
+# weight of the latest measurement in the decaying average of a folder's duration
+NAS_FOLDER_SIZE_DURATION_WEIGHT = 0.5
+# poll interval once a task runs past its expected duration, doubling up to the max
+NAS_FOLDER_SIZE_POLL_INTERVAL = 0.5
+NAS_FOLDER_SIZE_MAX_POLL_INTERVAL = 5
@@ -42,10 +42,6 @@ class SynoApiLoginResponse(BaseModel):
     success: Literal[True]
 
 
-class SynoApiLogoutResponse(BaseModel):
-    success: Literal[True]
-
-
 class SynoFileTime(BaseModel):
     atime: int
     ctime: int
@@ -115,15 +111,35 @@ class SynoTaskStartResponse(BaseModel):
     data: SynoTaskStartData
 
 
-class SynoCompletedSizeTaskData(BaseModel):
-    finished: Literal[True]
+class SynoSizeTaskData(BaseModel):
+    finished: bool
+    # progress so far while the task is still running
+    num_dir: int = 0
+    num_file: int = 0
+    total_size: int = 0
+
+
+class SynoFolderSizeIndexEntry(BaseModel):
+    mtime: int
+    measured_at: float
     num_dir: int
     num_file: int
     total_size: int
+    # seconds the DirSize task took, used to predict the next run
+    duration: float | None = None
+
+
+class SynoFolderSizeTask(BaseModel):
+    """A DirSize task left running past the timeout, resumed by the next refresh."""
+
+    task_id: str
+    # the folder's mtime when the task was started
+    mtime: int
+    started_at: float
 
 
-class SynoCompletedSizeTaskResponse(BaseModel):
-    data: SynoCompletedSizeTaskData
+class SynoSizeTaskResponse(BaseModel):
+    data: SynoSizeTaskData
     success: Literal[True]
 
 
@@ -146,6 +162,8 @@ class SynoFolderFullInfo(BaseModel):
     num_file: int
     total_size: int
     time: SynoFolderTimeData
+    # the size is the progress so far, the folder has never been measured in full
+    partial: bool = False
 
 
 class SynoFoldersResponse(BaseModel):
@@ -263,7 +281,9 @@ class SynoResourceUtilizationResponse(BaseModel):
 
 
 class SynoSystemResponse(BaseModel):
-    core: _SynoCoreSystemInfo
-    storage: _SynoStorageInfo
-    network: _SynoNetworkData
-    utilization: _SynoSystemUtilizationData
+    core: _SynoCoreSystemInfo | None
+    storage: _SynoStorageInfo | None
+    network: _SynoNetworkData | None
+    utilization: _SynoSystemUtilizationData | None
+    # section name -> error message for the sections that could not be fetched
+    errors: dict[str, str] = {}
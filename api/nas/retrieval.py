@@ -1,34 +1,53 @@
-from asyncio import gather, sleep
+import logging
+from asyncio import Semaphore, gather, sleep
+from time import monotonic, time
 from urllib.parse import urlencode
 
-import requests
-import urllib3
 from fastapi import Request
+from pydantic import BaseModel
+from redis.asyncio import Redis
 
 from api.config import Settings
-from api.nas.authentication import nas_session
+from api.nas.authentication import SynoSessionError, nas_session, syno_json
+from api.nas.constants import (
+    NAS_FOLDER_SIZE_CONCURRENCY,
+    NAS_FOLDER_SIZE_DURATION_WEIGHT,
+    NAS_FOLDER_SIZE_FIRST_POLL_FRACTION,
+    NAS_FOLDER_SIZE_INDEX_KEY,
+    NAS_FOLDER_SIZE_MAX_AGE,
+    NAS_FOLDER_SIZE_MAX_POLL_INTERVAL,
+    NAS_FOLDER_SIZE_POLL_INTERVAL,
+    NAS_FOLDER_SIZE_TASK_MAX_AGE,
+    NAS_FOLDER_SIZE_TASKS_KEY,
+    NAS_FOLDER_SIZE_TIMEOUT,
+    NAS_SYSTEM_PARTIAL_TTL,
+    NAS_SYSTEM_TTL,
+)
 from api.nas.models import (
     SynoApiVersions,
-    SynoCompletedSizeTaskData,
-    SynoCompletedSizeTaskResponse,
     SynoCoreSystemResponse,
     SynoFolderFullInfo,
+    SynoFolderSizeIndexEntry,
+    SynoFolderSizeTask,
     SynoFoldersResponse,
     SynoFolderTimeData,
     SynoListResponse,
     SynoNetworkResponse,
     SynoResourceUtilizationResponse,
+    SynoSizeTaskData,
+    SynoSizeTaskResponse,
     SynoStorageResponse,
     SynoSystemResponse,
     SynoTaskStartResponse,
 )
 from api.utils.cache import cache
+from api.utils.upstream import UpstreamClient
 
-urllib3.disable_warnings(category=urllib3.exceptions.InsecureRequestWarning)
+logger = logging.getLogger(__name__)
 
 
-def _get_list_info(
-    sid: str, versions: SynoApiVersions, folder: str
+async def _get_list_info(
+    client: UpstreamClient, sid: str, versions: SynoApiVersions, folder: str
 ) -> SynoListResponse:
     additional_fields = ["time"]
     additional_fields = [f'"{field}"' for field in additional_fields]
@@ -40,35 +59,34 @@ def _get_list_info(
         "additional": f'[{",".join(additional_fields)}]',
         "_sid": sid,
     }
-    r = requests.get(f"{Settings.NAS_API_BASE}?{urlencode(params)}", verify=False)
-    r.raise_for_status()
-    data = SynoListResponse(**r.json())
+    r = await client.get(f"{Settings.NAS_API_BASE}?{urlencode(params)}", verify=False)
+    data = SynoListResponse(**syno_json(r))
     return data
 
 
-def _start_folder_size_task(
-    sid: str, versions: SynoApiVersions, folders: list[str]
-) -> dict[str, str]:
+async def _start_folder_size_task(
+    client: UpstreamClient, sid: str, versions: SynoApiVersions, folder: str
+) -> str:
     start_params = {
         "api": "SYNO.FileStation.DirSize",
         "version": versions.ds_filestation_api_version,
         "method": "start",
+        "path": f'["{folder}"]',
         "_sid": sid,
     }
-    task_ids: dict[str, str] = {}
-    for folder in folders:
-        start_params["path"] = f'["{folder}"]'
-        r = requests.get(
-            f"{Settings.NAS_API_BASE}?{urlencode(start_params)}", verify=False
-        )
-        r.raise_for_status()
-        task_ids[folder] = SynoTaskStartResponse(**r.json()).data.taskid
-    return task_ids
+    r = await client.get(
+        f"{Settings.NAS_API_BASE}?{urlencode(start_params)}", verify=False
+    )
+    return SynoTaskStartResponse(**syno_json(r)).data.taskid
 
 
 async def _get_folder_size(
-    sid: str, versions: SynoApiVersions, folder: str, task_id: str
-) -> tuple[str, SynoCompletedSizeTaskData]:
+    client: UpstreamClient,
+    sid: str,
+    versions: SynoApiVersions,
+    task_id: str,
+    expected_duration: float | None,
+) -> SynoSizeTaskData:
     poll_pararms = {
         "api": "SYNO.FileStation.DirSize",
         "version": versions.ds_filestation_api_version,
@@ -76,23 +94,155 @@ async def _get_folder_size(
         "taskid": f'"{task_id}"',
         "_sid": sid,
     }
-    polling_retries: int = 0
-    while polling_retries < 20:
-        r = requests.get(
+    deadline = monotonic() + NAS_FOLDER_SIZE_TIMEOUT
+    # first poll part way into the previous measurement of this folder, the
+    # backoff below catches up if it takes as long again
+    delay = min(
+        (expected_duration or 0.0) * NAS_FOLDER_SIZE_FIRST_POLL_FRACTION,
+        NAS_FOLDER_SIZE_TIMEOUT,
+    )
+    interval = NAS_FOLDER_SIZE_POLL_INTERVAL
+    while True:
+        await sleep(delay)
+        r = await client.get(
             f"{Settings.NAS_API_BASE}?{urlencode(poll_pararms)}", verify=False
         )
-        r.raise_for_status()
-        if r.json().get("data", {}).get("finished"):
-            break
-        polling_retries += 1
-        await sleep(0.25 * (polling_retries + 1))
-    else:
-        raise ValueError("Failed to retrieve folder size information")
-    data = SynoCompletedSizeTaskResponse(**r.json())
-    return folder, data.data
-
-
-def _stop_folder_size_task(sid: str, versions: SynoApiVersions, task_id: str) -> None:
+        data = SynoSizeTaskResponse(**syno_json(r)).data
+        if data.finished or monotonic() + interval > deadline:
+            return data
+        delay = interval
+        interval = min(interval * 2, NAS_FOLDER_SIZE_MAX_POLL_INTERVAL)
+
+
+async def _stop_folder_size_task_quietly(
+    client: UpstreamClient,
+    sid: str,
+    versions: SynoApiVersions,
+    folder: str,
+    task_id: str,
+) -> None:
+    try:
+        await _stop_folder_size_task(client, sid, versions, task_id)
+    except Exception as e:
+        logger.warning(f"Failed to stop folder size task for {folder}: {e}")
+
+
+async def _run_folder_size_task(
+    client: UpstreamClient,
+    sid: str,
+    versions: SynoApiVersions,
+    folder: str,
+    task: SynoFolderSizeTask,
+    expected_duration: float | None,
+) -> SynoSizeTaskData:
+    stop = True
+    try:
+        data = await _get_folder_size(
+            client, sid, versions, task.task_id, expected_duration
+        )
+        # an unfinished task keeps scanning on the NAS until the next refresh,
+        # anything else is stopped
+        stop = data.finished
+        return data
+    finally:
+        if stop:
+            await _stop_folder_size_task_quietly(
+                client, sid, versions, folder, task.task_id
+            )
+
+
+async def _measure_folder_size(
+    client: UpstreamClient,
+    sid: str,
+    versions: SynoApiVersions,
+    folder: str,
+    mtime: int,
+    expected_duration: float | None,
+    pending: SynoFolderSizeTask | None,
+    semaphore: Semaphore,
+) -> tuple[str, SynoSizeTaskData, SynoFolderSizeTask]:
+    async with semaphore:
+        if pending is not None:
+            elapsed = time() - pending.started_at
+            if elapsed > NAS_FOLDER_SIZE_TASK_MAX_AGE:
+                await _stop_folder_size_task_quietly(
+                    client, sid, versions, folder, pending.task_id
+                )
+            else:
+                remaining = (
+                    None
+                    if expected_duration is None
+                    else max(expected_duration - elapsed, 0.0)
+                )
+                try:
+                    data = await _run_folder_size_task(
+                        client, sid, versions, folder, pending, remaining
+                    )
+                    return folder, data, pending
+                except SynoSessionError:
+                    raise
+                except Exception as e:
+                    # e.g. the NAS dropped the task, measure the folder again
+                    logger.warning(
+                        f"Failed to resume folder size task for {folder}: {e}"
+                    )
+
+        task = SynoFolderSizeTask(
+            task_id=await _start_folder_size_task(client, sid, versions, folder),
+            mtime=mtime,
+            started_at=time(),
+        )
+        data = await _run_folder_size_task(
+            client, sid, versions, folder, task, expected_duration
+        )
+        return folder, data, task
+
+
+async def _load_folder_size_index(
+    redis: Redis, paths: list[str]
+) -> dict[str, SynoFolderSizeIndexEntry]:
+    if not paths:
+        return {}
+    values = await redis.hmget(NAS_FOLDER_SIZE_INDEX_KEY, paths)
+    return {
+        path: SynoFolderSizeIndexEntry.model_validate_json(value)
+        for path, value in zip(paths, values)
+        if value is not None
+    }
+
+
+async def _load_folder_size_tasks(
+    redis: Redis, paths: list[str]
+) -> dict[str, SynoFolderSizeTask]:
+    if not paths:
+        return {}
+    values = await redis.hmget(NAS_FOLDER_SIZE_TASKS_KEY, paths)
+    return {
+        path: SynoFolderSizeTask.model_validate_json(value)
+        for path, value in zip(paths, values)
+        if value is not None
+    }
+
+
+def _average_duration(previous: float | None, measured: float) -> float:
+    # a decaying average, one slow run does not hold back later polls for good
+    if previous is None:
+        return measured
+    weight = NAS_FOLDER_SIZE_DURATION_WEIGHT
+    return weight * measured + (1 - weight) * previous
+
+
+def _needs_measuring(
+    entry: SynoFolderSizeIndexEntry | None, mtime: int, now: float
+) -> bool:
+    if entry is None or entry.mtime != mtime:
+        return True
+    return now - entry.measured_at > NAS_FOLDER_SIZE_MAX_AGE
+
+
+async def _stop_folder_size_task(
+    client: UpstreamClient, sid: str, versions: SynoApiVersions, task_id: str
+) -> None:
     stop_params = {
         "api": "SYNO.FileStation.DirSize",
         "version": versions.ds_filestation_api_version,
@@ -100,11 +250,19 @@ def _stop_folder_size_task(sid: str, versions: SynoApiVersions, task_id: str) ->
         "taskid": f'"{task_id}"',
         "_sid": sid,
     }
-    r = requests.get(f"{Settings.NAS_API_BASE}?{urlencode(stop_params)}", verify=False)
-    r.raise_for_status()
+    r = await client.get(
+        f"{Settings.NAS_API_BASE}?{urlencode(stop_params)}", verify=False
+    )
+    syno_json(r)
 
 
-@cache("nas:folders", SynoFoldersResponse, ttl=60 * 3)
+@cache(
+    "nas:folders",
+    SynoFoldersResponse,
+    ttl=60 * 3,
+    stale_ttl=60 * 60,
+    lock_ttl=60 * 2,
+)
 @nas_session
 async def retrieve_folders_info(
     request: Request,
@@ -112,27 +270,94 @@ async def retrieve_folders_info(
     versions: SynoApiVersions,
     folder: str,
 ) -> SynoFoldersResponse:
-    folder_info: SynoListResponse = _get_list_info(sid, versions, folder)
+    client: UpstreamClient = request.app.state.http
+    folder_info: SynoListResponse = await _get_list_info(client, sid, versions, folder)
 
-    # Start a folder size calculation task for each sub-folder
-    sub_folder_paths = [file.path for file in folder_info.data.files if file.isdir]
-    task_ids = _start_folder_size_task(sid, versions, sub_folder_paths)
+    # Only measure sub-folders whose indexed size is missing or out of date
+    sub_folders = [file for file in folder_info.data.files if file.isdir]
+    redis: Redis = request.app.state.redis
+    size_index = await _load_folder_size_index(
+        redis, [sub_folder.path for sub_folder in sub_folders]
+    )
+    now = time()
+    mtimes = {
+        sub_folder.path: sub_folder.additional.time.mtime for sub_folder in sub_folders
+    }
+    sub_folder_paths = [
+        path
+        for path, mtime in mtimes.items()
+        if _needs_measuring(size_index.get(path), mtime, now)
+    ]
 
-    # Retrieve the folder size information for each sub-folder
+    # Measure the changed sub-folders, a bounded number at a time, polling each
+    # around the time its previous measurement took. Tasks that ran past the
+    # timeout on an earlier refresh are polled again instead of started over.
+    durations = {path: entry.duration for path, entry in size_index.items()}
+    pending_tasks = await _load_folder_size_tasks(redis, sub_folder_paths)
+    semaphore = Semaphore(NAS_FOLDER_SIZE_CONCURRENCY)
     folder_size_info = await gather(
         *[
-            _get_folder_size(sid, versions, sub_folder, task_id)
-            for sub_folder, task_id in task_ids.items()
+            _measure_folder_size(
+                client,
+                sid,
+                versions,
+                sub_folder,
+                mtimes[sub_folder],
+                durations.get(sub_folder),
+                pending_tasks.get(sub_folder),
+                semaphore,
+            )
+            for sub_folder in sub_folder_paths
         ]
     )
-    folder_size_info_dict = {folder: data for folder, data in folder_size_info}
+    measured: dict[str, SynoFolderSizeIndexEntry] = {}
+    running: dict[str, SynoFolderSizeTask] = {}
+    progress: dict[str, SynoSizeTaskData] = {}
+    for folder, data, task in folder_size_info:
+        if not data.finished:
+            running[folder] = task
+            progress[folder] = data
+            continue
+        measured[folder] = SynoFolderSizeIndexEntry(
+            mtime=task.mtime,
+            measured_at=task.started_at,
+            num_dir=data.num_dir,
+            num_file=data.num_file,
+            total_size=data.total_size,
+            duration=_average_duration(durations.get(folder), time() - task.started_at),
+        )
 
-    # Create the response data
+    if measured:
+        await redis.hset(
+            NAS_FOLDER_SIZE_INDEX_KEY,
+            mapping={
+                folder: entry.model_dump_json() for folder, entry in measured.items()
+            },
+        )
+    if running:
+        await redis.hset(
+            NAS_FOLDER_SIZE_TASKS_KEY,
+            mapping={
+                folder: task.model_dump_json() for folder, task in running.items()
+            },
+        )
+    done = [folder for folder in pending_tasks if folder not in running]
+    if done:
+        await redis.hdel(NAS_FOLDER_SIZE_TASKS_KEY, *done)
+    size_index.update(measured)
+
+    # Create the response data, a folder still being measured keeps its last
+    # complete size and only falls back to the progress so far if it has none
     folder_data: list[SynoFolderFullInfo] = []
     for sub_folder_basic_info in folder_info.data.files:
         if not sub_folder_basic_info.isdir:
             continue
-        sub_folder_size_info = folder_size_info_dict[sub_folder_basic_info.path]
+        partial = sub_folder_basic_info.path not in size_index
+        sub_folder_size_info = (
+            progress[sub_folder_basic_info.path]
+            if partial
+            else size_index[sub_folder_basic_info.path]
+        )
 
         folder_data.append(
             SynoFolderFullInfo(
@@ -148,75 +373,80 @@ async def retrieve_folders_info(
                     last_modified=sub_folder_basic_info.additional.time.mtime,
                     created=sub_folder_basic_info.additional.time.crtime,
                 ),
+                partial=partial,
             )
         )
-    results = SynoFoldersResponse(
+    return SynoFoldersResponse(
         folders=folder_data,
     )
 
-    # Stop the folder size calculation tasks
-    for task_id in task_ids.values():
-        _stop_folder_size_task(sid, versions, task_id)
 
-    return results
+async def _get_system_part(
+    client: UpstreamClient, params: dict, response_model: type
+) -> BaseModel:
+    r = await client.get(f"{Settings.NAS_API_BASE}?{urlencode(params)}", verify=False)
+    return response_model(**syno_json(r)).data
 
 
-@cache("nas:system", SynoSystemResponse, ttl=60 * 1)
+def _system_info_ttl(result: SynoSystemResponse) -> int:
+    return NAS_SYSTEM_PARTIAL_TTL if result.errors else NAS_SYSTEM_TTL
+
+
+@cache(
+    "nas:system",
+    SynoSystemResponse,
+    ttl=NAS_SYSTEM_TTL,
+    lock_ttl=30,
+    result_ttl=_system_info_ttl,
+)
 @nas_session
 async def retrieve_system_info(
     request: Request, sid: str, versions: SynoApiVersions
 ) -> SynoSystemResponse:
+    client: UpstreamClient = request.app.state.http
     base_params = {
         "version": f'"{versions.ds_core_system_api_version}"',
         "_sid": sid,
-    }
-
-    # Core System Info
-    params = {
-        **base_params,
         "api": "SYNO.Core.System",
         "method": "info",
     }
-    r = requests.get(f"{Settings.NAS_API_BASE}?{urlencode(params)}", verify=False)
-    r.raise_for_status()
-    core_info = SynoCoreSystemResponse(**r.json())
-
-    # Storage Info
-    params = {
-        **base_params,
-        "api": "SYNO.Core.System",
-        "method": "info",
-        "type": "storage",
+    parts = {
+        "core": (base_params, SynoCoreSystemResponse),
+        "storage": ({**base_params, "type": "storage"}, SynoStorageResponse),
+        "network": ({**base_params, "type": "network"}, SynoNetworkResponse),
+        "utilization": (
+            {
+                **base_params,
+                "version": f'"{versions.ds_utilization_api_version}"',
+                "api": "SYNO.Core.System.Utilization",
+                "method": "get",
+            },
+            SynoResourceUtilizationResponse,
+        ),
     }
-    r = requests.get(f"{Settings.NAS_API_BASE}?{urlencode(params)}", verify=False)
-    r.raise_for_status()
-    storage_info = SynoStorageResponse(**r.json())
 
-    # Network Info
-    params = {
-        **base_params,
-        "api": "SYNO.Core.System",
-        "method": "info",
-        "type": "network",
-    }
-    r = requests.get(f"{Settings.NAS_API_BASE}?{urlencode(params)}", verify=False)
-    r.raise_for_status()
-    network_info = SynoNetworkResponse(**r.json())
-
-    # Resource Utilization Info
-    params = {
-        **base_params,
-        "version": f'"{versions.ds_utilization_api_version}"',
-        "api": "SYNO.Core.System.Utilization",
-        "method": "get",
-    }
-    r = requests.get(f"{Settings.NAS_API_BASE}?{urlencode(params)}", verify=False)
-    r.raise_for_status()
-    utilization_info = SynoResourceUtilizationResponse(**r.json())
-
-    return SynoSystemResponse(
-        core=core_info.data,
-        storage=storage_info.data,
-        network=network_info.data,
-        utilization=utilization_info.data,
+    # the calls are independent, so the endpoint only waits for the slowest one
+    results = await gather(
+        *(
+            _get_system_part(client, params, response_model)
+            for params, response_model in parts.values()
+        ),
+        return_exceptions=True,
     )
+
+    data = {}
+    errors = {}
+    for name, result in zip(parts, results):
+        if isinstance(result, SynoSessionError):
+            # let nas_session log in again and retry the whole thing
+            raise result
+        if isinstance(result, Exception):
+            logger.warning(f"Failed to retrieve NAS {name} info: {result}")
+            errors[name] = str(result)
+            result = None
+        data[name] = result
+
+    if len(errors) == len(parts):
+        raise next(r for r in results if isinstance(r, Exception))
+
+    return SynoSystemResponse(**data, errors=errors)
@@ -22,14 +22,14 @@ async def get_nas_health(request: Request):
 
 @router.get("/versions/", tags=["Ping"], response_model=SynoApiVersions)
 async def get_nas_versions(request: Request):
-    return await retrieve_api_versions(request)
+    return await retrieve_api_versions.response(request)
 
 
 @router.get("/system/", response_model=SynoSystemResponse)
 async def get_nas_system_info(request: Request):
-    return await retrieve_system_info(request)
+    return await retrieve_system_info.response(request)
 
 
 @router.get("/folders/", response_model=SynoFoldersResponse)
 async def get_nas_folders(request: Request, folder: str | None = "/media"):
-    return await retrieve_folders_info(request, folder=folder)
+    return await retrieve_folders_info.response(request, folder=folder)
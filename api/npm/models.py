@@ -29,3 +29,9 @@ class NPMPackageInfo(BaseModel):
     issues: str
     pulls: str
     downloads: NPMDownloads
+
+
+class NPMBatchResponse(BaseModel):
+    packages: list[NPMPackageInfo]
+    # packages that could not be retrieved, keyed by name
+    errors: dict[str, str] = {}
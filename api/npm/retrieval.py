@@ -1,22 +1,33 @@
+import asyncio
 import logging
+from itertools import batched
 
-import requests
+import httpx
 from fastapi import HTTPException, Request, status
 
-from api.npm.models import NPMDownloads, NPMDownloadsDay, NPMPackageInfo
+from api.npm.models import (
+    NPMBatchResponse,
+    NPMDownloads,
+    NPMDownloadsDay,
+    NPMPackageInfo,
+)
 from api.utils.cache import cache
 
 logger = logging.getLogger(__name__)
 
+# the downloads API answers up to 128 unscoped packages in one bulk request
+NPM_BULK_MAX_PACKAGES = 128
 
-@cache("npm:package", NPMPackageInfo, ttl=60 * 60)
-async def retrieve_package_info(request: Request, package_name: str) -> NPMPackageInfo:
+
+async def _retrieve_registry_info(
+    request: Request, package_name: str
+) -> NPMPackageInfo:
     try:
         url = f"https://registry.npmjs.org/{package_name}/latest"
-        r = requests.get(url)
+        r = await request.app.state.http.get(url)
         r.raise_for_status()
         raw_data = r.json()
-        response_data = NPMPackageInfo(
+        return NPMPackageInfo(
             name=raw_data["name"],
             version=raw_data["version"],
             description=raw_data["description"],
@@ -32,35 +43,127 @@ async def retrieve_package_info(request: Request, package_name: str) -> NPMPacka
                 end=None,
             ),
         )
-    except requests.exceptions.ConnectionError as e:
+    except httpx.TransportError as e:
         logger.error(e)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Connection to NPM API Refused",
         )
 
-    try:
-        url = f"https://api.npmjs.org/downloads/point/last-month/{package_name}"
-        r = requests.get(url)
-        raw_data = r.json()
-        response_data.downloads.total = raw_data["downloads"]
-    except requests.exceptions.RequestException:
-        logger.error("Failed to fetch NPM package downloads")
 
-    try:
-        url = f"https://api.npmjs.org/downloads/range/last-month/{package_name}"
-        r = requests.get(url)
-        raw_data = r.json()
-        response_data.downloads.start = raw_data["start"]
-        response_data.downloads.end = raw_data["end"]
-        response_data.downloads.per_day = [
+async def _retrieve_downloads(
+    request: Request, kind: str, package_names: list[str]
+) -> dict[str, dict]:
+    """Retrieve last month's ``point`` or ``range`` downloads keyed by package.
+
+    Unscoped packages are requested in bulk, scoped packages are not supported by
+    the bulk form and are requested one at a time.
+    """
+    unscoped = [name for name in package_names if not name.startswith("@")]
+    batches = [list(batch) for batch in batched(unscoped, NPM_BULK_MAX_PACKAGES)]
+    batches += [[name] for name in package_names if name.startswith("@")]
+
+    async def fetch(batch: list[str]) -> dict[str, dict]:
+        try:
+            url = f"https://api.npmjs.org/downloads/{kind}/last-month/{','.join(batch)}"
+            r = await request.app.state.http.get(url)
+            raw_data = r.json()
+        except (httpx.HTTPError, ValueError):
+            # ValueError: the reply was not JSON
+            logger.error(f"Failed to fetch NPM {kind} downloads for {batch}")
+            return {}
+        # a single package is answered directly, several are keyed by name
+        if len(batch) == 1:
+            return {batch[0]: raw_data}
+        return {name: data for name, data in raw_data.items() if data is not None}
+
+    downloads: dict[str, dict] = {}
+    for batch_downloads in await asyncio.gather(*[fetch(batch) for batch in batches]):
+        downloads.update(batch_downloads)
+    return downloads
+
+
+def _apply_downloads(
+    package_info: NPMPackageInfo, point: dict | None, per_day: dict | None
+) -> None:
+    if point is not None and "downloads" in point:
+        package_info.downloads.total = point["downloads"]
+    if per_day is not None and "downloads" in per_day:
+        package_info.downloads.start = per_day["start"]
+        package_info.downloads.end = per_day["end"]
+        package_info.downloads.per_day = [
             NPMDownloadsDay(
                 downloads=day["downloads"],
                 day=day["day"],
             )
-            for day in raw_data["downloads"]
+            for day in per_day["downloads"]
         ]
-    except requests.exceptions.RequestException:
-        logger.error("Failed to fetch NPM package downloads per day")
 
+
+@cache("npm:package", NPMPackageInfo, ttl=60 * 60)
+async def retrieve_package_info(request: Request, package_name: str) -> NPMPackageInfo:
+    response_data, point, per_day = await asyncio.gather(
+        _retrieve_registry_info(request, package_name),
+        _retrieve_downloads(request, "point", [package_name]),
+        _retrieve_downloads(request, "range", [package_name]),
+    )
+    _apply_downloads(response_data, point.get(package_name), per_day.get(package_name))
     return response_data
+
+
+@cache("npm:batch", NPMBatchResponse, ttl=60 * 60)
+async def retrieve_packages_info(
+    request: Request, package_names: list[str]
+) -> NPMBatchResponse:
+    # packages cached on their own (or by an earlier batch) are not fetched again
+    cached = await asyncio.gather(
+        *[
+            retrieve_package_info.lookup(request, package_name=name)
+            for name in package_names
+        ]
+    )
+    packages = {
+        name: package_info
+        for name, package_info in zip(package_names, cached)
+        if package_info is not None
+    }
+    missing = [name for name in package_names if name not in packages]
+
+    errors: dict[str, str] = {}
+    if missing:
+        registry_info, point, per_day = await asyncio.gather(
+            asyncio.gather(
+                *[_retrieve_registry_info(request, name) for name in missing],
+                return_exceptions=True,
+            ),
+            _retrieve_downloads(request, "point", missing),
+            _retrieve_downloads(request, "range", missing),
+        )
+
+        fetched: dict[str, NPMPackageInfo] = {}
+        for package_name, package_info in zip(missing, registry_info):
+            # an unknown package should not fail the others in the batch
+            if isinstance(package_info, httpx.HTTPStatusError):
+                logger.warning(f"Failed to retrieve NPM package {package_name}")
+                errors[package_name] = str(package_info)
+                continue
+            if isinstance(package_info, BaseException):
+                raise package_info
+            _apply_downloads(
+                package_info, point.get(package_name), per_day.get(package_name)
+            )
+            fetched[package_name] = package_info
+
+        # later single package requests and batches are answered from the cache
+        await asyncio.gather(
+            *[
+                retrieve_package_info.store(request, package_info, package_name=name)
+                for name, package_info in fetched.items()
+            ]
+        )
+        packages.update(fetched)
+
+    return NPMBatchResponse(
+        packages=[packages[name] for name in package_names if name in packages],
+        errors=errors,
+    )
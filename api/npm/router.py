@@ -1,9 +1,9 @@
 import logging
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Query, Request
 
-from api.npm.models import NPMPackageInfo
-from api.npm.retrieval import retrieve_package_info
+from api.npm.models import NPMBatchResponse, NPMPackageInfo
+from api.npm.retrieval import retrieve_package_info, retrieve_packages_info
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +13,15 @@ router = APIRouter(
 )
 
 
+# npm package names can not start with "_", so this can not hide a real package
+@router.get("/_batch/", response_model=NPMBatchResponse)
+async def get_batch_package_stats(request: Request, packages: list[str] = Query()):
+    # one cache entry per set of packages, whatever order they are asked for in
+    return await retrieve_packages_info.response(
+        request, package_names=sorted(set(packages))
+    )
+
+
 @router.get("/{package_name}/", response_model=NPMPackageInfo)
 async def get_package_stats(request: Request, package_name: str):
-    return await retrieve_package_info(request, package_name=package_name)
+    return await retrieve_package_info.response(request, package_name=package_name)
@@ -1,22 +1,28 @@
+import json
 import logging
 from functools import wraps
 from typing import Callable
 
-import requests
-import urllib3
+import httpx
+from fastapi import Request, status
 
 from api.config import Settings
-
-urllib3.disable_warnings(category=urllib3.exceptions.InsecureRequestWarning)
+from api.utils.session import forget_shared_session, get_shared_session
+from api.utils.upstream import UpstreamClient
 
 logger = logging.getLogger(__name__)
 
+# the SID is shared by all workers through Redis
+PIHOLE_SID_KEY = "pihole:sid"
+# log in again this many seconds before the session would time out
+PIHOLE_SID_RENEW_BEFORE = 60
+
 
-def _pihole_login() -> str:
+async def _pihole_login(client: UpstreamClient) -> tuple[str, int]:
     url = f"{Settings.PIHOLE_API_BASE}/api/auth"
     logger.warning(url)
     data = {"password": Settings.PIHOLE_API_PASSWORD}
-    r = requests.post(url, json=data, verify=False)
+    r = await client.post(url, json=data, verify=False)
     r.raise_for_status()
     data = r.json()
     if "error" in data:
@@ -25,25 +31,39 @@ def _pihole_login() -> str:
         raise Exception("Pi-hole login failed: No session token returned")
     if data["session"].get("valid") is False or not data["session"].get("sid"):
         raise Exception("Pi-hole login failed: Unsuccessful status")
-    logger.warning(f"Pi-hole login successful, SID: {data['session']['sid']}")
-    return data["session"]["sid"]
+    logger.info("Pi-hole login successful")
+    return data["session"]["sid"], data["session"].get("validity", 300)
 
 
-def _pihole_logout(sid: str) -> None:
-    url = f"{Settings.PIHOLE_API_BASE}/api/auth"
-    headers = {"X-FTL-SID": sid}
-    r = requests.delete(url, headers=headers, verify=False)
-    r.raise_for_status()
+async def get_pihole_session(request: Request) -> str:
+    """Return the shared Pi-hole session as JSON, logging in only if none is usable."""
+
+    async def login() -> tuple[str, int]:
+        sid, validity = await _pihole_login(request.app.state.http)
+        return json.dumps({"sid": sid, "validity": validity}), validity
+
+    return await get_shared_session(
+        request, PIHOLE_SID_KEY, login, renew_before=PIHOLE_SID_RENEW_BEFORE
+    )
 
 
 def pihole_session(func: Callable) -> Callable:
     @wraps(func)
-    async def wrapper(*args, **kwargs):
-        sid = _pihole_login()
+    async def wrapper(request: Request, *args, **kwargs):
+        raw_session = await get_pihole_session(request)
+        session = json.loads(raw_session)
         try:
-            result = await func(sid=sid, *args, **kwargs)
-        finally:
-            _pihole_logout(sid)
+            result = await func(request=request, sid=session["sid"], *args, **kwargs)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != status.HTTP_401_UNAUTHORIZED:
+                raise
+            logger.info("Pi-hole session rejected, logging in again")
+            await forget_shared_session(request, PIHOLE_SID_KEY, raw_session)
+            session = json.loads(await get_pihole_session(request))
+            result = await func(request=request, sid=session["sid"], *args, **kwargs)
+
+        # every authenticated request extends the session on the Pi-hole side
+        await request.app.state.redis.expire(PIHOLE_SID_KEY, session["validity"])
         return result
 
     return wrapper
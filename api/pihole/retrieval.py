@@ -1,7 +1,6 @@
 import logging
 import time
 
-import requests
 from fastapi import Request
 
 from api.config import Settings
@@ -22,7 +21,7 @@ logger = logging.getLogger(__name__)
 async def retrieve_blocking(request: Request, sid: str) -> PiholeBlockingResponse:
     params = {"sid": sid}
     url = f"{Settings.PIHOLE_API_BASE}/api/dns/blocking"
-    r = requests.get(url, params=params, verify=False)
+    r = await request.app.state.http.get(url, params=params, verify=False)
     r.raise_for_status()
     return PiholeBlockingResponse(**r.json())
 
@@ -38,13 +37,15 @@ async def retrieve_recent_stats(
     # /api/stats/summary
     stats_params = {"from": twenty_four_hours_ago, "until": now, "sid": sid}
     stats_url = f"{Settings.PIHOLE_API_BASE}/api/stats/database/summary"
-    stats_r = requests.get(stats_url, params=stats_params, verify=False)
+    stats_r = await request.app.state.http.get(
+        stats_url, params=stats_params, verify=False
+    )
     stats_r.raise_for_status()
 
     # /api/info/ftl
     ftl_params = {"sid": sid}
     ftl_url = f"{Settings.PIHOLE_API_BASE}/api/info/ftl"
-    ftl_r = requests.get(ftl_url, params=ftl_params, verify=False)
+    ftl_r = await request.app.state.http.get(ftl_url, params=ftl_params, verify=False)
     ftl_r.raise_for_status()
     ftl_data = ftl_r.json().get("ftl", {})
 
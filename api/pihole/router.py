@@ -1,6 +1,6 @@
 import logging
 
-import requests
+import httpx
 from fastapi import APIRouter, HTTPException, Request, status
 
 from api.pihole.models import PiholeRecentStatsResponse
@@ -23,7 +23,7 @@ async def get_pihole_health(request: Request):
         service_status = "ok" if enabled else "warning"
 
         return {"status": service_status}
-    except requests.exceptions.ConnectionError as e:
+    except httpx.TransportError as e:
         logger.error(e)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
@@ -34,7 +34,7 @@ async def get_pihole_health(request: Request):
 @router.get("/summary/", response_model=PiholeRecentStatsResponse)
 async def get_pihole_summary(request: Request):
     try:
-        return await retrieve_recent_stats(request)
+        return await retrieve_recent_stats.response(request)
     except Exception as e:
         logger.error(f"Error retrieving Pi-hole summary: {e}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
@@ -24,6 +24,7 @@ class PlexPlayer(BaseModel):
 class PlexSession(BaseModel):
     """Model for an active Plex session."""
 
+    session_key: str | None = None  # Matches play state notifications
     username: str
     title: str
     media_type: str  # movie, episode, track
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import logging
+
+import httpx
+import websockets
+from fastapi import FastAPI, Request
+from redis.exceptions import RedisError
+
+from api.config import Settings
+from api.plex.models import PlexSession, PlexSessionsResponse
+from api.plex.retrieval import PLEX_HEADERS, fetch_sessions, retrieve_sessions
+
+logger = logging.getLogger(__name__)
+
+PLEX_NOTIFICATIONS_URL = (
+    f"{Settings.PLEX_API_BASE.replace('http', 'ws', 1)}/:/websockets/notifications"
+)
+# seconds to wait before reconnecting after the websocket drops
+PLEX_NOTIFICATIONS_RETRY = 5
+
+
+class PlexSessionTable:
+    """Active Plex sessions, kept current from play state notifications."""
+
+    def __init__(self):
+        self.sessions: dict[str, PlexSession] = {}
+
+    def replace(self, response: PlexSessionsResponse) -> None:
+        self.sessions = {
+            session.session_key: session
+            for session in response.sessions
+            if session.session_key is not None
+        }
+
+    def response(self) -> PlexSessionsResponse:
+        sessions = list(self.sessions.values())
+        return PlexSessionsResponse(count=len(sessions), sessions=sessions)
+
+    def apply(self, notification: dict) -> bool:
+        """Apply a play state notification, returns False if a resync is needed.
+
+        Notifications only carry the session key, state and offset, so a session
+        not in the table has to be fetched from ``/status/sessions``.
+        """
+        session_key = str(notification.get("sessionKey"))
+        state = notification.get("state")
+        if state == "stopped":
+            self.sessions.pop(session_key, None)
+            return True
+
+        session = self.sessions.get(session_key)
+        if session is None:
+            return False
+
+        view_offset = notification.get("viewOffset", session.view_offset_ms)
+        progress_percent = (
+            view_offset / session.duration_ms * 100 if session.duration_ms > 0 else 0
+        )
+        self.sessions[session_key] = session.model_copy(
+            update={
+                "player": session.player.model_copy(update={"state": state}),
+                "progress_percent": round(progress_percent, 1),
+                "view_offset_ms": view_offset,
+            }
+        )
+        return True
+
+
+async def _resync(request: Request, table: PlexSessionTable) -> None:
+    table.replace(await fetch_sessions(request))
+    await retrieve_sessions.store(request, table.response())
+
+
+async def _handle_message(
+    request: Request, table: PlexSessionTable, message: str | bytes
+) -> None:
+    container = json.loads(message).get("NotificationContainer", {})
+    if container.get("type") != "playing":
+        return
+
+    notifications = container.get("PlaySessionStateNotification", [])
+    in_sync = all([table.apply(notification) for notification in notifications])
+    if in_sync:
+        await retrieve_sessions.store(request, table.response())
+    else:
+        await _resync(request, table)
+
+
+async def listen_for_plex_sessions(app: FastAPI) -> None:
+    """Keep the cached Plex sessions current, runs for the app lifetime."""
+    request = Request({"type": "http", "app": app, "headers": []})
+    table = PlexSessionTable()
+    while True:
+        try:
+            async with websockets.connect(
+                PLEX_NOTIFICATIONS_URL, additional_headers=PLEX_HEADERS
+            ) as websocket:
+                # events may have been missed while (re)connecting
+                await _resync(request, table)
+                async for message in websocket:
+                    await _handle_message(request, table, message)
+        except (
+            OSError,
+            ValueError,
+            httpx.HTTPError,
+            RedisError,
+            websockets.WebSocketException,
+        ) as e:
+            logger.warning(f"Plex notification listener disconnected: {e}")
+            await asyncio.sleep(PLEX_NOTIFICATIONS_RETRY)
@@ -1,6 +1,7 @@
+import asyncio
 import logging
 
-import requests
+import httpx
 from fastapi import HTTPException, Request, status
 
 from api.config import Settings
@@ -20,6 +21,8 @@ PLEX_HEADERS = {
     "Accept": "application/json",
     "X-Plex-Token": Settings.PLEX_API_TOKEN,
 }
+# how many library sections are counted at the same time
+PLEX_SECTION_CONCURRENCY = 4
 
 
 @cache("plex:health", PlexHealthResponse, ttl=60)
@@ -28,7 +31,7 @@ async def retrieve_health(request: Request) -> PlexHealthResponse:
     url = f"{Settings.PLEX_API_BASE}/"
 
     try:
-        response = requests.get(url, headers=PLEX_HEADERS)
+        response = await request.app.state.http.get(url, headers=PLEX_HEADERS)
         response.raise_for_status()
         data = response.json()
 
@@ -42,13 +45,13 @@ async def retrieve_health(request: Request) -> PlexHealthResponse:
             claimed=media_container.get("claimed", False),
             machine_identifier=media_container.get("machineIdentifier", "Unknown"),
         )
-    except requests.exceptions.ConnectionError as e:
+    except httpx.TransportError as e:
         logger.error(f"Failed to connect to Plex server: {e}")
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Connection to Plex server refused",
         )
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         logger.error(f"Plex API error: {e}")
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
@@ -56,66 +59,73 @@ async def retrieve_health(request: Request) -> PlexHealthResponse:
         )
 
 
-@cache("plex:sessions", PlexSessionsResponse, ttl=15)
-async def retrieve_sessions(request: Request) -> PlexSessionsResponse:
-    """Retrieve currently active Plex sessions with user and media info."""
+async def fetch_sessions(request: Request) -> PlexSessionsResponse:
+    """Fetch the active Plex sessions, bypassing the cache."""
     url = f"{Settings.PLEX_API_BASE}/status/sessions"
 
-    try:
-        response = requests.get(url, headers=PLEX_HEADERS)
-        response.raise_for_status()
-        data = response.json()
+    response = await request.app.state.http.get(url, headers=PLEX_HEADERS)
+    response.raise_for_status()
+    data = response.json()
 
-        media_container = data.get("MediaContainer", {})
-        metadata_list = media_container.get("Metadata", [])
-
-        sessions: list[PlexSession] = []
-
-        for item in metadata_list:
-            # Get user info
-            user = item.get("User", {})
-            username = user.get("title", "Unknown User")
-
-            # Get player info
-            player_data = item.get("Player", {})
-            player = PlexPlayer(
-                title=player_data.get("title", "Unknown Device"),
-                platform=player_data.get("platform", "Unknown"),
-                product=player_data.get("product", "Unknown"),
-                state=player_data.get("state", "unknown"),
-            )
-
-            # Calculate progress
-            duration = item.get("duration", 0)
-            view_offset = item.get("viewOffset", 0)
-            progress_percent = (view_offset / duration * 100) if duration > 0 else 0
-
-            session = PlexSession(
-                username=username,
-                title=item.get("title", "Unknown"),
-                media_type=item.get("type", "unknown"),
-                grandparent_title=item.get("grandparentTitle"),
-                parent_title=item.get("parentTitle"),
-                year=item.get("year"),
-                thumb=item.get("thumb"),
-                player=player,
-                progress_percent=round(progress_percent, 1),
-                duration_ms=duration,
-                view_offset_ms=view_offset,
-            )
-            sessions.append(session)
-
-        return PlexSessionsResponse(
-            count=len(sessions),
-            sessions=sessions,
+    media_container = data.get("MediaContainer", {})
+    metadata_list = media_container.get("Metadata", [])
+
+    sessions: list[PlexSession] = []
+
+    for item in metadata_list:
+        # Get user info
+        user = item.get("User", {})
+        username = user.get("title", "Unknown User")
+
+        # Get player info
+        player_data = item.get("Player", {})
+        player = PlexPlayer(
+            title=player_data.get("title", "Unknown Device"),
+            platform=player_data.get("platform", "Unknown"),
+            product=player_data.get("product", "Unknown"),
+            state=player_data.get("state", "unknown"),
+        )
+
+        # Calculate progress
+        duration = item.get("duration", 0)
+        view_offset = item.get("viewOffset", 0)
+        progress_percent = (view_offset / duration * 100) if duration > 0 else 0
+
+        session = PlexSession(
+            session_key=item.get("sessionKey"),
+            username=username,
+            title=item.get("title", "Unknown"),
+            media_type=item.get("type", "unknown"),
+            grandparent_title=item.get("grandparentTitle"),
+            parent_title=item.get("parentTitle"),
+            year=item.get("year"),
+            thumb=item.get("thumb"),
+            player=player,
+            progress_percent=round(progress_percent, 1),
+            duration_ms=duration,
+            view_offset_ms=view_offset,
         )
-    except requests.exceptions.ConnectionError as e:
+        sessions.append(session)
+
+    return PlexSessionsResponse(
+        count=len(sessions),
+        sessions=sessions,
+    )
+
+
+# kept current by the notification listener, polling is only a fallback resync
+@cache("plex:sessions", PlexSessionsResponse, ttl=60)
+async def retrieve_sessions(request: Request) -> PlexSessionsResponse:
+    """Retrieve currently active Plex sessions with user and media info."""
+    try:
+        return await fetch_sessions(request)
+    except httpx.TransportError as e:
         logger.error(f"Failed to connect to Plex server: {e}")
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Connection to Plex server refused",
         )
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         logger.error(f"Plex API error: {e}")
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
@@ -123,61 +133,72 @@ async def retrieve_sessions(request: Request) -> PlexSessionsResponse:
         )
 
 
-@cache("plex:library_counts", PlexLibraryCountsResponse, ttl=300)
+async def _retrieve_section_count(
+    request: Request, directory: dict, semaphore: asyncio.Semaphore
+) -> PlexLibrarySection:
+    """Retrieve the item count of a single library section."""
+    section_key = directory.get("key", "")
+
+    # Get the count for this section by querying it
+    section_url = f"{Settings.PLEX_API_BASE}/library/sections/{section_key}/all"
+    async with semaphore:
+        section_response = await request.app.state.http.get(
+            section_url,
+            headers=PLEX_HEADERS,
+            params={"X-Plex-Container-Start": 0, "X-Plex-Container-Size": 0},
+        )
+    section_response.raise_for_status()
+    section_data = section_response.json()
+
+    section_container = section_data.get("MediaContainer", {})
+    return PlexLibrarySection(
+        key=section_key,
+        title=directory.get("title", "Unknown"),
+        type=directory.get("type", "unknown"),
+        count=section_container.get("totalSize", 0),
+    )
+
+
+@cache(
+    "plex:library_counts",
+    PlexLibraryCountsResponse,
+    ttl=300,
+    stale_ttl=60 * 60,
+    lock_ttl=30,
+)
 async def retrieve_library_counts(request: Request) -> PlexLibraryCountsResponse:
     """Retrieve counts for all library sections."""
     url = f"{Settings.PLEX_API_BASE}/library/sections"
 
     try:
-        response = requests.get(url, headers=PLEX_HEADERS)
+        response = await request.app.state.http.get(url, headers=PLEX_HEADERS)
         response.raise_for_status()
         data = response.json()
 
         media_container = data.get("MediaContainer", {})
         directories = media_container.get("Directory", [])
 
-        sections: list[PlexLibrarySection] = []
-        total_items = 0
-
-        for directory in directories:
-            section_key = directory.get("key", "")
-            section_title = directory.get("title", "Unknown")
-            section_type = directory.get("type", "unknown")
-
-            # Get the count for this section by querying it
-            section_url = f"{Settings.PLEX_API_BASE}/library/sections/{section_key}/all"
-            section_response = requests.get(
-                section_url,
-                headers=PLEX_HEADERS,
-                params={"X-Plex-Container-Start": 0, "X-Plex-Container-Size": 0},
-            )
-            section_response.raise_for_status()
-            section_data = section_response.json()
-
-            section_container = section_data.get("MediaContainer", {})
-            count = section_container.get("totalSize", 0)
-
-            sections.append(
-                PlexLibrarySection(
-                    key=section_key,
-                    title=section_title,
-                    type=section_type,
-                    count=count,
-                )
-            )
-            total_items += count
+        # Count every section concurrently, a bounded number at a time
+        semaphore = asyncio.Semaphore(PLEX_SECTION_CONCURRENCY)
+        sections: list[PlexLibrarySection] = await asyncio.gather(
+            *[
+                _retrieve_section_count(request, directory, semaphore)
+                for directory in directories
+            ]
+        )
+        total_items = sum(section.count for section in sections)
 
         return PlexLibraryCountsResponse(
             total_items=total_items,
             sections=sections,
         )
-    except requests.exceptions.ConnectionError as e:
+    except httpx.TransportError as e:
         logger.error(f"Failed to connect to Plex server: {e}")
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Connection to Plex server refused",
         )
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         logger.error(f"Plex API error: {e}")
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
@@ -1,7 +1,7 @@
 import logging
 from urllib.parse import quote
 
-import requests
+import httpx
 from fastapi import HTTPException, Request, status
 
 from api.config import Settings
@@ -11,7 +11,7 @@ from api.utils.cache import cache
 logger = logging.getLogger(__name__)
 
 
-@cache("portfolio:ogp", OGPPreviewResponse, ttl=60 * 60 * 3)
+@cache("portfolio:ogp", OGPPreviewResponse, ttl=60 * 60 * 3, stale_ttl=60 * 60 * 24)
 async def retrieve_ogp_data(request: Request) -> OGPPreviewResponse:
     ogp_app_id = Settings.OGP_IO_API_KEY
 
@@ -20,18 +20,18 @@ async def retrieve_ogp_data(request: Request) -> OGPPreviewResponse:
     url = f"https://opengraph.io/api/1.1/site/{encoded_url}/?app_id={ogp_app_id}"
 
     try:
-        r = requests.get(url)
+        r = await request.app.state.http.get(url)
         r.raise_for_status()
         raw_data = r.json()
 
         return OGPPreviewResponse(**raw_data)
-    except requests.exceptions.ConnectionError as e:
+    except httpx.TransportError as e:
         logger.error(e)
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Connection to OpenGraph.io Refused",
         )
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         logger.error(e)
         if (
             r.status_code == status.HTTP_403_FORBIDDEN
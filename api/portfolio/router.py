@@ -15,4 +15,4 @@ router = APIRouter(
 
 @router.get("/ogp/", response_model=OGPPreviewResponse)
 async def get_ogp_data(request: Request):
-    return await retrieve_ogp_data(request)
+    return await retrieve_ogp_data.response(request)
@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 # Mock all required environment variables before any imports
 os.environ.setdefault("SERVER_IP", "127.0.0.1")
 os.environ.setdefault("GITHUB_USERNAME", "testuser")
@@ -14,3 +16,13 @@ os.environ.setdefault("pihole_password", "testpass")
 os.environ.setdefault("ga4_credentials", "{}")
 os.environ.setdefault("monarchmoney_token", "test-token")
 os.environ.setdefault("plex_token", "test-plex-token")
+
+
+@pytest.fixture(autouse=True)
+def clear_local_cache():
+    """Start every test with an empty in-process cache"""
+    from api.utils.cache import local_cache
+
+    local_cache.clear()
+    yield
+    local_cache.clear()
@@ -1,3 +1,4 @@
+import asyncio
 import json
 from unittest.mock import AsyncMock, MagicMock
 
@@ -5,7 +6,8 @@ import pytest
 from fastapi import Request
 from pydantic import BaseModel
 
-from api.utils.cache import cache
+from api.utils.cache import _background_tasks, cache
+from api.utils.local_cache import LocalCache
 
 
 class SampleModel(BaseModel):
@@ -50,6 +52,7 @@ class TestCacheDecorator:
 
         mock_redis = AsyncMock()
         mock_redis.get.return_value = cached_data
+        mock_redis.ttl.return_value = 60
 
         mock_request = MagicMock(spec=Request)
         mock_request.app.state.redis = mock_redis
@@ -126,3 +129,225 @@ class TestCacheDecorator:
         assert "test:key" in call_args
         assert '"test"' in call_args or "test" in call_args
         assert "20" in call_args
+
+    async def test_cache_stale_hit_revalidates_in_background(self):
+        """Test a stale hit is served immediately and refreshed in the background"""
+        cached_data = json.dumps({"value": "stale", "count": 1})
+
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = cached_data
+        mock_redis.ttl.return_value = 30
+
+        mock_request = MagicMock(spec=Request)
+        mock_request.app.state.redis = mock_redis
+
+        @cache("test:swr", SampleModel, ttl=60, stale_ttl=120)
+        async def test_func(request: Request):
+            return SampleModel(value="fresh", count=2)
+
+        result = await test_func(request=mock_request)
+
+        # Verify the stale result was returned without waiting for a refresh
+        assert result.value == "stale"
+
+        # Let the background revalidation finish
+        await asyncio.gather(*_background_tasks)
+
+        mock_redis.set.assert_called_once()
+        assert mock_redis.set.call_args.kwargs["ex"] == 180
+        assert "fresh" in mock_redis.set.call_args.args[1]
+
+    async def test_cache_fresh_hit_within_stale_mode(self):
+        """Test a hit before the soft TTL expires does not revalidate"""
+        cached_data = json.dumps({"value": "cached", "count": 1})
+
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = cached_data
+        mock_redis.ttl.return_value = 150
+
+        mock_request = MagicMock(spec=Request)
+        mock_request.app.state.redis = mock_redis
+
+        @cache("test:swr", SampleModel, ttl=60, stale_ttl=120)
+        async def test_func(request: Request):
+            return SampleModel(value="fresh", count=2)
+
+        result = await test_func(request=mock_request)
+
+        assert result.value == "cached"
+        assert not _background_tasks
+        mock_redis.set.assert_not_called()
+
+    async def test_cache_concurrent_misses_are_coalesced(self):
+        """Test concurrent misses for one key share a single function call"""
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = None
+
+        mock_request = MagicMock(spec=Request)
+        mock_request.app.state.redis = mock_redis
+
+        calls = 0
+
+        @cache("test:coalesce", SampleModel, ttl=60)
+        async def test_func(request: Request):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return SampleModel(value="fresh", count=calls)
+
+        results = await asyncio.gather(
+            *[test_func(request=mock_request) for _ in range(5)]
+        )
+
+        # Verify every caller got the result of the one call
+        assert calls == 1
+        assert all(result.count == 1 for result in results)
+        mock_redis.set.assert_called_once()
+
+    async def test_cache_waits_for_other_worker_holding_lock(self):
+        """Test a miss waits for the worker holding the Redis lock"""
+        cached_data = json.dumps({"value": "other", "count": 7})
+
+        mock_redis = AsyncMock()
+        mock_redis.get.side_effect = [None, cached_data]
+        mock_lock = AsyncMock()
+        mock_lock.acquire.return_value = False
+        mock_redis.lock = MagicMock(return_value=mock_lock)
+
+        mock_request = MagicMock(spec=Request)
+        mock_request.app.state.redis = mock_redis
+
+        function_called = False
+
+        @cache("test:lock", SampleModel, ttl=60, lock_ttl=5)
+        async def test_func(request: Request):
+            nonlocal function_called
+            function_called = True
+            return SampleModel(value="fresh", count=1)
+
+        result = await test_func(request=mock_request)
+
+        # Verify the other worker's result was used
+        assert result.value == "other"
+        assert function_called is False
+        mock_redis.set.assert_not_called()
+
+    async def test_cache_second_hit_served_from_local_cache(self):
+        """Test a Redis hit populates the in-process cache for later hits"""
+        cached_data = json.dumps({"value": "cached", "count": 123})
+
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = cached_data
+        mock_redis.ttl.return_value = 60
+
+        mock_request = MagicMock(spec=Request)
+        mock_request.app.state.redis = mock_redis
+
+        @cache("test:l1", SampleModel, ttl=60)
+        async def test_func(request: Request):
+            return SampleModel(value="fresh", count=999)
+
+        first = await test_func(request=mock_request)
+        second = await test_func(request=mock_request)
+
+        # Verify the same validated model is reused without a Redis round trip
+        assert second is first
+        mock_redis.get.assert_called_once()
+
+    async def test_cache_store_writes_result_without_calling_function(self):
+        """Test a result stored directly is served on the next call"""
+        mock_redis = AsyncMock()
+
+        mock_request = MagicMock(spec=Request)
+        mock_request.app.state.redis = mock_redis
+
+        mock_func = AsyncMock(return_value=SampleModel(value="fetched", count=1))
+
+        @cache("test:store", SampleModel, ttl=60)
+        async def test_func(request: Request, name: str):
+            return await mock_func()
+
+        stored = SampleModel(value="pushed", count=2)
+        await test_func.store(mock_request, stored, "a")
+        result = await test_func(mock_request, "a")
+
+        # Verify the stored result is written to Redis and reused locally
+        assert result is stored
+        mock_func.assert_not_called()
+        mock_redis.set.assert_called_once_with(
+            'test:store:["a"]:{}', stored.model_dump_json(), ex=60
+        )
+
+    async def test_cache_response_reuses_serialized_body(self):
+        """Test routes get the stored JSON body and ETag without re-encoding"""
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = None
+
+        mock_request = MagicMock(spec=Request)
+        mock_request.app.state.redis = mock_redis
+
+        mock_request.headers = {}
+
+        @cache("test:response", SampleModel, ttl=60)
+        async def test_func(request: Request):
+            return SampleModel(value="test", count=42)
+
+        first = await test_func.response(mock_request)
+        second = await test_func.response(mock_request)
+
+        serialized = mock_redis.set.call_args.args[1]
+        assert first.body == serialized.encode()
+        assert second.body is first.body
+        assert first.headers["ETag"] == second.headers["ETag"]
+        assert first.media_type == "application/json"
+
+    async def test_cache_response_not_modified(self):
+        """Test a matching If-None-Match gets a 304 and clients always revalidate"""
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = None
+
+        mock_request = MagicMock(spec=Request)
+        mock_request.app.state.redis = mock_redis
+        mock_request.headers = {}
+
+        @cache("test:etag", SampleModel, ttl=60, stale_ttl=60)
+        async def test_func(request: Request):
+            return SampleModel(value="test", count=42)
+
+        first = await test_func.response(mock_request)
+        etag = first.headers["ETag"]
+        mock_request.headers = {"if-none-match": etag.removeprefix("W/")}
+        second = await test_func.response(mock_request)
+
+        assert first.status_code == 200
+        assert etag.startswith('W/"')
+        assert second.status_code == 304
+        assert second.body == b""
+        assert second.headers["ETag"] == etag
+        assert first.headers["Cache-Control"] == "no-cache"
+
+
+class TestLocalCache:
+    """Test the in-process LRU cache"""
+
+    def test_evicts_least_recently_used_over_byte_limit(self):
+        """Test entries are evicted LRU first once max_bytes is exceeded"""
+        local = LocalCache(max_entries=10, max_bytes=100)
+        local.set("a", "A", size=40, ttl=60)
+        local.set("b", "B", size=40, ttl=60)
+        # touch "a" so "b" is the least recently used
+        local.get("a")
+        local.set("c", "C", size=40, ttl=60)
+
+        assert "a" in local
+        assert "b" not in local
+        assert "c" in local
+        assert local.size == 80
+
+    def test_expired_entries_are_dropped(self):
+        """Test entries are not returned past their TTL"""
+        local = LocalCache()
+        local.set("a", "A", size=1, ttl=0)
+
+        assert local.get("a") is None
+        assert len(local) == 0
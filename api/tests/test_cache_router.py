@@ -0,0 +1,54 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.main import api
+from api.nas.constants import NAS_FOLDER_SIZE_INDEX_KEY, NAS_SID_KEY
+from api.pihole.authentication import PIHOLE_SID_KEY
+
+
+@pytest.fixture
+def mock_redis(monkeypatch):
+    """Attach a mock redis to the app for the duration of a test"""
+    mock_redis = AsyncMock()
+    monkeypatch.setattr(api.state, "redis", mock_redis, raising=False)
+    return mock_redis
+
+
+@pytest.fixture
+def client():
+    """Create a test client for the API"""
+    return TestClient(api)
+
+
+class TestCacheRouter:
+    """Test the cache inspection endpoints"""
+
+    def test_session_ids_are_not_exposed(self, client, mock_redis):
+        """Test shared session IDs can not be read, listed or replaced"""
+        mock_redis.keys.return_value = [
+            NAS_SID_KEY.encode(),
+            PIHOLE_SID_KEY.encode(),
+            b"nas:system:[]:{}",
+        ]
+
+        assert client.get(f"/cache/get/{NAS_SID_KEY}/").status_code == 403
+        assert client.get(f"/cache/get/{PIHOLE_SID_KEY}/").status_code == 403
+        assert client.delete(f"/cache/delete/{PIHOLE_SID_KEY}/").status_code == 403
+        assert client.post(f"/cache/set/{NAS_SID_KEY}/").status_code == 403
+        assert client.get("/cache/get/").json() == {"keys": ["nas:system:[]:{}"]}
+        mock_redis.get.assert_not_called()
+        mock_redis.set.assert_not_called()
+        mock_redis.delete.assert_not_called()
+
+    def test_reads_hash_keys(self, client, mock_redis):
+        """Test keys stored as a Redis hash are returned with all their fields"""
+        mock_redis.type.return_value = b"hash"
+        mock_redis.hgetall.return_value = {b"/media/tv": b"{}"}
+
+        response = client.get(f"/cache/get/{NAS_FOLDER_SIZE_INDEX_KEY}/")
+
+        assert response.status_code == 200
+        assert response.json()["value"] == {"/media/tv": "{}"}
+        mock_redis.get.assert_not_called()
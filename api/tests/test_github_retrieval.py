@@ -1,20 +1,38 @@
-from unittest.mock import AsyncMock, MagicMock, patch
+import json
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
 
+import httpx
 import pytest
-import requests
 from fastapi import HTTPException
 
-from api.github.models import EventsResponseModel
-from api.github.retrieval import retrieve_events
+from api.github.models import (
+    EventModel,
+    EventsResponseModel,
+    EventStoreModel,
+    RepoModel,
+)
+from api.github.retrieval import (
+    GITHUB_EVENTS_STORE_KEY,
+    _count_event,
+    retrieve_events,
+)
+
+
+def days_ago(days: int) -> str:
+    """Create a GitHub event timestamp from the given number of days ago"""
+    created_at = datetime.now(timezone.utc) - timedelta(days=days)
+    return created_at.strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
 @pytest.mark.asyncio
 class TestGitHubRetrieval:
     """Test GitHub retrieval functions"""
 
-    @patch("api.github.retrieval.requests.get")
-    async def test_retrieve_events_success(self, mock_get):
+    async def test_retrieve_events_success(self):
         """Test successful retrieval of GitHub events"""
+        mock_get = AsyncMock()
+
         # Mock response
         mock_response = MagicMock()
         mock_response.json.return_value = [
@@ -27,43 +45,210 @@ class TestGitHubRetrieval:
                     "url": "https://api.github.com/repos/test/repo",
                 },
                 "payload": {"commits": [{"sha": "abc123"}, {"sha": "def456"}]},
-                "created_at": "2024-01-01T12:00:00Z",
+                "created_at": days_ago(2),
             }
         ]
+        mock_response.status_code = 200
+        mock_response.headers = {"ETag": 'W/"abc"'}
         mock_get.return_value = mock_response
 
         # Mock request with redis
         mock_redis = AsyncMock()
         mock_redis.get.return_value = None
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
 
         mock_request = MagicMock()
         mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
 
         # Call function
         result = await retrieve_events(mock_request)
 
-        # Verify result - the function calls the API 3 times for 3 pages
+        # Verify result - a short first page means there are no more pages
         assert isinstance(result, EventsResponseModel)
-        assert len(result.events) == 3  # Called 3 times, one event per call
+        assert len(result.events) == 1
         assert result.events[0].type == "PushEvent"
         assert result.events[0].commits == 2
+        mock_get.assert_called_once()
+
+        # Verify the page is cached with its ETag for conditional requests
+        page_key, page_value = mock_redis.set.call_args_list[0].args
+        assert page_key == "github:events:page:1"
+        assert json.loads(page_value)["etag"] == 'W/"abc"'
+
+    async def test_retrieve_events_not_modified_reuses_page(self):
+        """Test a 304 for a conditional request reuses the cached page"""
+        cached_page = {
+            "etag": 'W/"abc"',
+            "last_modified": None,
+            "events": [
+                {
+                    "id": "123",
+                    "type": "WatchEvent",
+                    "repo": {
+                        "id": 456,
+                        "name": "other/repo",
+                        "url": "https://api.github.com/repos/other/repo",
+                    },
+                    "payload": {},
+                    "created_at": days_ago(2),
+                }
+            ],
+        }
+        mock_response = MagicMock()
+        mock_response.status_code = 304
+        mock_get = AsyncMock(return_value=mock_response)
+
+        mock_redis = AsyncMock()
+        mock_redis.get.side_effect = lambda key: (
+            json.dumps(cached_page) if key.startswith("github:events:page:") else None
+        )
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
+
+        mock_request = MagicMock()
+        mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
+
+        result = await retrieve_events(mock_request)
+
+        assert len(result.events) == 1
+        assert result.events_seen == {"WatchEvent": 1}
+        mock_response.json.assert_not_called()
+        assert mock_get.call_args.kwargs["headers"] == {"If-None-Match": 'W/"abc"'}
 
-    @patch("api.github.retrieval.requests.get")
-    async def test_retrieve_events_rate_limit(self, mock_get):
+    async def test_retrieve_events_only_adds_new_events(self):
+        """Test stored events are kept and only newer ones are added"""
+        stored = EventStoreModel()
+        old_event = EventModel(
+            id="1",
+            type="IssuesEvent",
+            repo=RepoModel(id=1, name="other/repo", url="https://example.com/1"),
+            created_at=days_ago(2),
+        )
+        _count_event(stored, old_event, 1)
+        stored.events = [old_event]
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = [
+            {
+                "id": "2",
+                "type": "PullRequestEvent",
+                "repo": {"id": 1, "name": "other/repo", "url": "https://example.com/1"},
+                "payload": {},
+                "created_at": days_ago(1),
+            },
+            {
+                "id": "1",
+                "type": "IssuesEvent",
+                "repo": {"id": 1, "name": "other/repo", "url": "https://example.com/1"},
+                "payload": {},
+                "created_at": days_ago(2),
+            },
+        ]
+        mock_get = AsyncMock(return_value=mock_response)
+
+        mock_redis = AsyncMock()
+        mock_redis.get.side_effect = lambda key: (
+            stored.model_dump_json() if key == GITHUB_EVENTS_STORE_KEY else None
+        )
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
+
+        mock_request = MagicMock()
+        mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
+
+        result = await retrieve_events(mock_request)
+
+        assert [event.id for event in result.events] == ["2", "1"]
+        assert result.events_seen == {"IssuesEvent": 1, "PullRequestEvent": 1}
+        assert len(result.repos_seen) == 1
+        assert result.contributions.oss_projects == 2
+        mock_get.assert_called_once()
+
+    async def test_retrieve_events_drops_events_past_window(self):
+        """Test events older than GitHub's window are removed with their counts"""
+        stored = EventStoreModel()
+        recent_event = EventModel(
+            id="2",
+            type="PushEvent",
+            commits=0,
+            repo=RepoModel(id=1, name="testuser/repo", url="https://example.com/1"),
+            created_at=days_ago(10),
+        )
+        old_event = EventModel(
+            id="1",
+            type="IssuesEvent",
+            repo=RepoModel(id=2, name="testuser/old", url="https://example.com/2"),
+            created_at=days_ago(100),
+        )
+        for event in (recent_event, old_event):
+            _count_event(stored, event, 1)
+        stored.events = [recent_event, old_event]
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.json.return_value = [
+            {
+                "id": "2",
+                "type": "PushEvent",
+                "repo": {
+                    "id": 1,
+                    "name": "testuser/repo",
+                    "url": "https://example.com/1",
+                },
+                "payload": {"commits": []},
+                "created_at": days_ago(10),
+            }
+        ]
+
+        mock_redis = AsyncMock()
+        mock_redis.get.side_effect = lambda key: (
+            stored.model_dump_json() if key == GITHUB_EVENTS_STORE_KEY else None
+        )
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
+
+        mock_request = MagicMock()
+        mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = AsyncMock(return_value=mock_response)
+
+        result = await retrieve_events(mock_request)
+
+        assert [event.id for event in result.events] == ["2"]
+        assert result.events_seen == {"PushEvent": 1}
+        assert [repo.name for repo in result.repos_seen] == ["testuser/repo"]
+        # Verify a push without commits does not count as a contribution
+        assert result.contributions.own_projects == 0
+        # Verify the trimmed store is saved even without new events
+        store_sets = [
+            call
+            for call in mock_redis.set.call_args_list
+            if call.args[0] == GITHUB_EVENTS_STORE_KEY
+        ]
+        assert len(store_sets) == 1
+
+    async def test_retrieve_events_rate_limit(self):
         """Test handling of GitHub API rate limit"""
+        mock_get = AsyncMock()
+
         # Mock rate limit response
         mock_response = MagicMock()
         mock_response.json.return_value = {
             "message": "API rate limit exceeded for user"
         }
+        mock_response.status_code = 403
         mock_get.return_value = mock_response
 
         # Mock request
         mock_redis = AsyncMock()
         mock_redis.get.return_value = None
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
 
         mock_request = MagicMock()
         mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
 
         # Call function and expect exception
         with pytest.raises(HTTPException) as exc_info:
@@ -72,18 +257,21 @@ class TestGitHubRetrieval:
         assert exc_info.value.status_code == 503
         assert "Rate Limit" in exc_info.value.detail
 
-    @patch("api.github.retrieval.requests.get")
-    async def test_retrieve_events_connection_error(self, mock_get):
+    async def test_retrieve_events_connection_error(self):
         """Test handling of connection errors"""
+        mock_get = AsyncMock()
+
         # Mock connection error
-        mock_get.side_effect = requests.exceptions.ConnectionError("Connection refused")
+        mock_get.side_effect = httpx.ConnectError("Connection refused")
 
         # Mock request
         mock_redis = AsyncMock()
         mock_redis.get.return_value = None
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
 
         mock_request = MagicMock()
         mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
 
         # Call function and expect exception
         with pytest.raises(HTTPException) as exc_info:
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.google_analytics.retrieval import (
+    GA4_DAYS_KEY,
+    GA4_SYNCED_UNTIL_KEY,
+    create_ga4_client,
+    retrieve_active_users_per_day,
+)
+from api.main import api
+from api.utils.cache import local_cache
+
+
+def make_row(day: str, active_users: int) -> MagicMock:
+    """Create a GA4 report row for one day"""
+    row = MagicMock()
+    row.dimension_values = [MagicMock(value=day)]
+    row.metric_values = [MagicMock(value=str(active_users))]
+    return row
+
+
+@pytest.mark.asyncio
+class TestGoogleAnalyticsRetrieval:
+    """Test Google Analytics retrieval functions"""
+
+    async def test_only_recent_days_are_queried(self):
+        """Test a synced series only queries the refresh window and merges it"""
+        today = datetime.now().date()
+        yesterday = today - timedelta(days=1)
+        old_day = (today - timedelta(days=100)).strftime("%Y%m%d")
+        expired_day = (today - timedelta(days=400)).strftime("%Y%m%d")
+        store = {
+            old_day.encode(): b"7",
+            expired_day.encode(): b"9",
+        }
+
+        mock_redis = AsyncMock()
+        mock_redis.get.side_effect = lambda key: (
+            yesterday.strftime("%Y-%m-%d").encode()
+            if key == GA4_SYNCED_UNTIL_KEY
+            else None
+        )
+        mock_redis.exists.return_value = 1
+        mock_redis.hset.side_effect = lambda key, mapping: store.update(
+            {day.encode(): str(value).encode() for day, value in mapping.items()}
+        )
+        mock_redis.hgetall.side_effect = lambda key: dict(store)
+
+        mock_client = MagicMock()
+        mock_client.run_report = AsyncMock(
+            return_value=MagicMock(rows=[make_row(today.strftime("%Y%m%d"), 3)])
+        )
+
+        mock_request = MagicMock()
+        mock_request.app.state.redis = mock_redis
+        mock_request.app.state.ga4 = mock_client
+
+        result = await retrieve_active_users_per_day(mock_request)
+
+        api_request = mock_client.run_report.call_args.args[0]
+        expected_start = today - timedelta(days=3)
+        assert api_request.date_ranges[0].start_date == expected_start.strftime(
+            "%Y-%m-%d"
+        )
+
+        per_day = {str(day.date)[:10]: day.active_users for day in result.per_day}
+        assert len(per_day) == 366
+        assert per_day[today.strftime("%Y-%m-%d")] == 3
+        assert per_day[(today - timedelta(days=100)).strftime("%Y-%m-%d")] == 7
+        mock_redis.hdel.assert_called_once_with(GA4_DAYS_KEY, expired_day)
+
+    async def test_reports_run_on_shared_client(self, mocker):
+        """Test every refresh awaits run_report on the one client created at startup"""
+        mock_client = MagicMock()
+        mock_client.run_report = AsyncMock(return_value=MagicMock(rows=[]))
+        mock_from_info = mocker.patch(
+            "api.google_analytics.retrieval.BetaAnalyticsDataAsyncClient"
+            ".from_service_account_info",
+            return_value=mock_client,
+        )
+
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = None
+        mock_redis.hgetall.return_value = {}
+
+        mock_request = MagicMock()
+        mock_request.app.state.redis = mock_redis
+        mock_request.app.state.ga4 = create_ga4_client()
+
+        await retrieve_active_users_per_day(mock_request)
+        local_cache.clear()
+        await retrieve_active_users_per_day(mock_request)
+
+        mock_from_info.assert_called_once()
+        assert mock_client.run_report.await_count == 2
+
+
+class TestGoogleAnalyticsDisabled:
+    """Test Google Analytics without valid credentials"""
+
+    def test_invalid_credentials_disable_client(self, mocker):
+        """Test invalid credentials give no client instead of failing startup"""
+        mocker.patch(
+            "api.google_analytics.retrieval.BetaAnalyticsDataAsyncClient"
+            ".from_service_account_info",
+            side_effect=ValueError("missing fields client_email"),
+        )
+
+        assert create_ga4_client() is None
+
+    def test_disabled_client_returns_503(self, monkeypatch):
+        """Test the active users route answers 503 when GA is disabled"""
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = None
+        monkeypatch.setattr(api.state, "redis", mock_redis, raising=False)
+        monkeypatch.setattr(api.state, "ga4", None, raising=False)
+
+        response = TestClient(api).get("/a/active_users/")
+
+        assert response.status_code == 503
+        assert response.json()["detail"] == "Google Analytics Credentials Invalid"
@@ -0,0 +1,82 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from api.leetcode.models import LCAllStatsModel
+from api.leetcode.retrieval import retrieve_all, retrieve_languages
+
+DIFFICULTIES = ["All", "Easy", "Medium", "Hard"]
+
+
+def make_response() -> MagicMock:
+    """Create a LeetCode GraphQL response for the combined stats query"""
+    mock_response = MagicMock()
+    mock_response.json.return_value = {
+        "data": {
+            "allQuestionsCount": [
+                {"difficulty": difficulty, "count": 100} for difficulty in DIFFICULTIES
+            ],
+            "matchedUser": {
+                "problemsSolvedBeatsStats": [
+                    {"difficulty": difficulty, "percentage": 50.0}
+                    for difficulty in DIFFICULTIES[1:]
+                ],
+                "submitStatsGlobal": {
+                    "acSubmissionNum": [
+                        {"difficulty": difficulty, "count": 25}
+                        for difficulty in DIFFICULTIES
+                    ]
+                },
+                "languageProblemCount": [
+                    {"languageName": "Python", "problemsSolved": 10},
+                    {"languageName": "Python3", "problemsSolved": 20},
+                    {"languageName": "Java", "problemsSolved": 5},
+                ],
+                "tagProblemCounts": {
+                    "advanced": [],
+                    "intermediate": [],
+                    "fundamental": [
+                        {"tagName": "Array", "tagSlug": "array", "problemsSolved": 9}
+                    ],
+                },
+            },
+        }
+    }
+    return mock_response
+
+
+@pytest.mark.asyncio
+class TestLeetCodeRetrieval:
+    """Test LeetCode retrieval functions"""
+
+    async def test_retrieve_all_populates_every_endpoint(self):
+        """Test one GraphQL request caches the solved, languages and topics keys"""
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = None
+
+        mock_request = MagicMock()
+        mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.post = AsyncMock(return_value=make_response())
+
+        result = await retrieve_all(mock_request)
+
+        assert isinstance(result, LCAllStatsModel)
+        assert result.solved.easy.solved_percent == 25.0
+        assert result.topics.fundamental[0].tagSlug == "array"
+        mock_request.app.state.http.post.assert_called_once()
+
+        cached_keys = {call.args[0] for call in mock_redis.set.call_args_list}
+        assert cached_keys == {
+            "lc:all:[]:{}",
+            "lc:solved:[]:{}",
+            "lc:languages:[]:{}",
+            "lc:topics:[]:{}",
+        }
+
+        # Verify the individual endpoints are now answered without a request
+        languages = await retrieve_languages(mock_request)
+        assert [language.languageName for language in languages.languages] == [
+            "Python",
+            "Java",
+        ]
+        mock_request.app.state.http.post.assert_called_once()
@@ -1,7 +1,12 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
 import pytest
 from fastapi.testclient import TestClient
 
-from api.main import api
+from api.main import api, stream_cache_updates
+from api.utils.cache import _notify_subscribers
 
 
 @pytest.fixture
@@ -21,3 +26,48 @@ class TestMainEndpoints:
         data = response.json()
         assert data["status"] == "ok"
         assert "root_path" in data
+
+
+@pytest.mark.asyncio
+class TestCacheUpdateStream:
+    """Test the cache update SSE stream"""
+
+    async def test_streams_matching_updates(self):
+        """Test only updates for the requested keys are pushed with their value"""
+        mock_request = MagicMock()
+        mock_request.is_disconnected = AsyncMock(return_value=False)
+        mock_request.app.state.redis.get = AsyncMock(
+            return_value=b'{"count": 1, "sessions": []}'
+        )
+
+        stream = stream_cache_updates(mock_request, ["plex:sessions"])
+        next_event = asyncio.create_task(anext(stream))
+        await asyncio.sleep(0)
+        _notify_subscribers("nas:system:[]:{}")
+        _notify_subscribers("plex:sessions:[]:{}")
+        event = await next_event
+        await stream.aclose()
+
+        assert json.loads(event.removeprefix("data: ")) == {
+            "key": "plex:sessions:[]:{}",
+            "value": {"count": 1, "sessions": []},
+        }
+        mock_request.app.state.redis.get.assert_awaited_once_with("plex:sessions:[]:{}")
+
+    async def test_streams_plain_keys(self):
+        """Test keys written outside @cache, such as speedtest, are streamed too"""
+        mock_request = MagicMock()
+        mock_request.is_disconnected = AsyncMock(return_value=False)
+        mock_request.app.state.redis.get = AsyncMock(return_value=b'{"ping": 10.5}')
+
+        stream = stream_cache_updates(mock_request, ["speedtest"])
+        next_event = asyncio.create_task(anext(stream))
+        await asyncio.sleep(0)
+        _notify_subscribers("speedtest")
+        event = await next_event
+        await stream.aclose()
+
+        assert json.loads(event.removeprefix("data: ")) == {
+            "key": "speedtest",
+            "value": {"ping": 10.5},
+        }
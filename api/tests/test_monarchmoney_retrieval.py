@@ -0,0 +1,124 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from api.main import api
+from api.monarchmoney.models import MoneyAccountsResponse
+from api.monarchmoney.retrieval import retrieve_accounts, retrieve_portfolio
+
+
+@pytest.mark.asyncio
+class TestMonarchMoneyRetrieval:
+    """Test Monarch Money retrieval functions"""
+
+    async def test_portfolio_and_accounts_share_one_request(self):
+        """Test one GraphQL request answers both the portfolio and accounts"""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "data": {
+                "portfolio": {
+                    "performance": {"totalValue": 1000.0, "oneDayChangeDollars": 5.0}
+                },
+                "accountTypeSummaries": [
+                    {
+                        "type": {
+                            "name": "brokerage",
+                            "display": "Invest",
+                            "group": "a",
+                        },
+                        "accounts": [],
+                        "totalDisplayBalance": 1000.0,
+                    }
+                ],
+            }
+        }
+
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = None
+
+        mock_request = MagicMock()
+        mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.post = AsyncMock(return_value=mock_response)
+
+        portfolio = await retrieve_portfolio(mock_request)
+        accounts = await retrieve_accounts(mock_request)
+
+        assert portfolio.totalValue == 1000.0
+        assert accounts.data.accountTypeSummaries[0].totalDisplayBalance == 1000.0
+        mock_request.app.state.http.post.assert_called_once()
+
+    async def test_missing_portfolio_only_fails_portfolio(self):
+        """Test a null portfolio does not fail the accounts endpoint"""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "data": {"portfolio": None, "accountTypeSummaries": []},
+            "errors": [{"message": "No investments", "path": ["portfolio"]}],
+        }
+
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = None
+
+        mock_request = MagicMock()
+        mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.post = AsyncMock(return_value=mock_response)
+
+        accounts = await retrieve_accounts(mock_request)
+        with pytest.raises(HTTPException) as exc_info:
+            await retrieve_portfolio(mock_request)
+
+        assert accounts.data.accountTypeSummaries == []
+        assert exc_info.value.status_code == 503
+        mock_request.app.state.http.post.assert_called_once()
+
+
+class TestMonarchMoneyAccountsEndpoint:
+    """Test the accounts endpoint field projection"""
+
+    def test_fields_limits_account_fields(self, mocker):
+        """Test only the requested account fields are returned"""
+        account = {
+            "id": "1",
+            "syncDisabled": False,
+            "isHidden": False,
+            "isAsset": True,
+            "includeInNetWorth": True,
+            "type": {"name": "brokerage", "display": "Brokerage"},
+            "displayName": "Brokerage",
+            "displayBalance": 1000.0,
+            "signedBalance": 1000.0,
+            "updatedAt": "2024-01-01T00:00:00Z",
+            "icon": "trending-up",
+            "logoUrl": None,
+            "includeBalanceInNetWorth": True,
+            "institution": None,
+        }
+        accounts = MoneyAccountsResponse(
+            data={
+                "accountTypeSummaries": [
+                    {
+                        "type": {
+                            "name": "brokerage",
+                            "display": "Invest",
+                            "group": "a",
+                        },
+                        "accounts": [account],
+                        "totalDisplayBalance": 1000.0,
+                    }
+                ]
+            }
+        )
+        mocker.patch(
+            "api.monarchmoney.router.retrieve_accounts",
+            AsyncMock(return_value=accounts),
+        )
+        client = TestClient(api)
+
+        response = client.get("/money/accounts/?fields=id,displayBalance")
+        bad_response = client.get("/money/accounts/?fields=id,password")
+
+        summary = response.json()["data"]["accountTypeSummaries"][0]
+        assert summary["accounts"] == [{"id": "1", "displayBalance": 1000.0}]
+        assert summary["totalDisplayBalance"] == 1000.0
+        assert bad_response.status_code == 400
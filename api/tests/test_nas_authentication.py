@@ -0,0 +1,87 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from api.nas.authentication import SynoSessionError, nas_session
+from api.nas.constants import NAS_SID_KEY
+
+VERSIONS = {
+    "ds_auth_api_version": 7,
+    "ds_filestation_api_version": 2,
+    "ds_core_system_api_version": 1,
+    "ds_utilization_api_version": 1,
+}
+
+
+def make_request(store: dict) -> MagicMock:
+    """Create a mock request whose redis reads and writes the given dict"""
+    mock_redis = AsyncMock()
+    mock_redis.get.side_effect = lambda key: store.get(key)
+    mock_redis.set.side_effect = lambda key, value, **kwargs: store.update(
+        {key: value.encode() if isinstance(value, str) else value}
+    )
+    mock_redis.delete.side_effect = lambda key: store.pop(key, None)
+    mock_redis.ttl.return_value = 60
+    mock_redis.lock = MagicMock(return_value=AsyncMock())
+
+    login_response = MagicMock()
+    login_response.json.return_value = {
+        "data": {
+            "account": "testuser",
+            "device_id": "device",
+            "is_portal_port": False,
+            "sid": "new-sid",
+        },
+        "success": True,
+    }
+
+    mock_request = MagicMock()
+    mock_request.app.state.redis = mock_redis
+    mock_request.app.state.http.get = AsyncMock(return_value=login_response)
+    return mock_request
+
+
+@pytest.mark.asyncio
+class TestNasSession:
+    """Test the shared NAS session pool"""
+
+    async def test_reuses_shared_sid(self):
+        """Test a SID held in Redis is used without logging in"""
+        store = {
+            "nas:versions:[]:{}": json.dumps(VERSIONS).encode(),
+            NAS_SID_KEY: b"shared-sid",
+        }
+        mock_request = make_request(store)
+
+        @nas_session
+        async def test_func(request, sid, versions):
+            return sid
+
+        result = await test_func(mock_request)
+
+        assert result == "shared-sid"
+        mock_request.app.state.http.get.assert_not_called()
+
+    async def test_logs_in_again_on_session_error(self):
+        """Test an expired SID is replaced and the call retried once"""
+        store = {
+            "nas:versions:[]:{}": json.dumps(VERSIONS).encode(),
+            NAS_SID_KEY: b"expired-sid",
+        }
+        mock_request = make_request(store)
+        sids_seen = []
+
+        @nas_session
+        async def test_func(request, sid, versions):
+            sids_seen.append(sid)
+            if sid == "expired-sid":
+                raise SynoSessionError("DSM session error 119")
+            return sid
+
+        result = await test_func(mock_request)
+
+        assert result == "new-sid"
+        assert sids_seen == ["expired-sid", "new-sid"]
+        assert store[NAS_SID_KEY] == b"new-sid"
+        mock_request.app.state.http.get.assert_called_once()
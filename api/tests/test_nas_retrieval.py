@@ -0,0 +1,335 @@
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock
+from urllib.parse import unquote_plus
+
+import httpx
+import pytest
+
+from api.nas.constants import (
+    NAS_FOLDER_SIZE_INDEX_KEY,
+    NAS_FOLDER_SIZE_TASKS_KEY,
+    NAS_SID_KEY,
+    NAS_SYSTEM_PARTIAL_TTL,
+)
+from api.nas.models import (
+    SynoFolderSizeIndexEntry,
+    SynoFolderSizeTask,
+    SynoSystemResponse,
+)
+from api.nas.retrieval import retrieve_folders_info, retrieve_system_info
+
+VERSIONS = {
+    "ds_auth_api_version": 7,
+    "ds_filestation_api_version": 2,
+    "ds_core_system_api_version": 1,
+    "ds_utilization_api_version": 1,
+}
+
+UTILIZATION = {
+    "data": {
+        "cpu": {"15min_load": 10, "5min_load": 12, "1min_load": 15},
+        "memory": {"real_usage": 42},
+    },
+    "success": True,
+}
+
+
+def make_folder(name: str, mtime: int) -> dict:
+    """Create a DSM list entry for a sub-folder of /media"""
+    return {
+        "name": name,
+        "path": f"/media/{name}",
+        "isdir": True,
+        "additional": {
+            "time": {"atime": mtime, "ctime": mtime, "mtime": mtime, "crtime": 0}
+        },
+    }
+
+
+def make_request(get: AsyncMock) -> MagicMock:
+    """Create a mock request with a logged in NAS session and no cached data"""
+    store = {
+        "nas:versions:[]:{}": json.dumps(VERSIONS).encode(),
+        NAS_SID_KEY: b"shared-sid",
+    }
+    mock_redis = AsyncMock()
+    mock_redis.get.side_effect = lambda key: store.get(key)
+    mock_redis.ttl.return_value = 60
+    mock_redis.lock = MagicMock(return_value=AsyncMock())
+
+    mock_request = MagicMock()
+    mock_request.app.state.redis = mock_redis
+    mock_request.app.state.http.get = get
+    return mock_request
+
+
+@pytest.mark.asyncio
+class TestNasSystemRetrieval:
+    """Test NAS system info retrieval"""
+
+    async def test_returns_partial_results(self):
+        """Test a failing section is reported without failing the others"""
+
+        async def mock_get(url, **kwargs):
+            if "Utilization" not in url:
+                raise httpx.ConnectTimeout("timed out")
+            response = MagicMock()
+            response.json.return_value = UTILIZATION
+            return response
+
+        mock_request = make_request(AsyncMock(side_effect=mock_get))
+
+        result = await retrieve_system_info(mock_request)
+
+        assert isinstance(result, SynoSystemResponse)
+        assert result.utilization.memory.real_usage == 42
+        assert result.core is None
+        assert set(result.errors) == {"core", "storage", "network"}
+        # Verify all four sections were requested
+        assert mock_request.app.state.http.get.call_count == 4
+        # Verify the partial result is only cached briefly
+        _, kwargs = mock_request.app.state.redis.set.call_args
+        assert kwargs["ex"] == NAS_SYSTEM_PARTIAL_TTL
+
+    async def test_raises_when_every_section_fails(self):
+        """Test nothing is returned when no section could be fetched"""
+        mock_get = AsyncMock(side_effect=httpx.ConnectTimeout("timed out"))
+        mock_request = make_request(mock_get)
+
+        with pytest.raises(httpx.ConnectTimeout):
+            await retrieve_system_info(mock_request)
+
+
+def set_hashes(
+    mock_request: MagicMock, index: dict | None = None, tasks: dict | None = None
+) -> None:
+    """Back the folder size index and running task hashes with the given dicts"""
+    hashes = {
+        NAS_FOLDER_SIZE_INDEX_KEY: index or {},
+        NAS_FOLDER_SIZE_TASKS_KEY: tasks or {},
+    }
+    mock_request.app.state.redis.hmget.side_effect = lambda key, paths: [
+        hashes[key].get(path) for path in paths
+    ]
+
+
+def requested_methods(get: AsyncMock) -> list[str]:
+    """List the DirSize methods called on the mock DSM, in order"""
+    urls = [call.args[0] for call in get.call_args_list]
+    return [
+        method
+        for url in urls
+        if "DirSize" in url
+        for method in ("start", "status", "stop")
+        if f"method={method}" in url
+    ]
+
+
+def make_folders_get(status: dict) -> AsyncMock:
+    """Create a DSM mock listing /media/movies whose DirSize status is given"""
+
+    async def mock_get(url, **kwargs):
+        response = MagicMock()
+        if "method=list" in url:
+            response.json.return_value = {
+                "data": {
+                    "files": [make_folder("movies", 100)],
+                    "offset": 0,
+                    "total": 1,
+                },
+                "success": True,
+            }
+        elif "method=start" in url:
+            response.json.return_value = {
+                "data": {"taskid": "task-1"},
+                "success": True,
+            }
+        elif "method=status" in url:
+            response.json.return_value = {"data": status, "success": True}
+        else:
+            response.json.return_value = {"success": True}
+        return response
+
+    return AsyncMock(side_effect=mock_get)
+
+
+@pytest.mark.asyncio
+class TestNasFoldersRetrieval:
+    """Test NAS folder size retrieval"""
+
+    async def test_only_changed_folders_are_measured(self):
+        """Test indexed folders with an unchanged mtime are not measured again"""
+        measured_paths = []
+
+        async def mock_get(url, **kwargs):
+            response = MagicMock()
+            if "method=list" in url:
+                response.json.return_value = {
+                    "data": {
+                        "files": [make_folder("movies", 100), make_folder("tv", 200)],
+                        "offset": 0,
+                        "total": 2,
+                    },
+                    "success": True,
+                }
+            elif "method=start" in url:
+                measured_paths.append(unquote_plus(url))
+                response.json.return_value = {
+                    "data": {"taskid": "task-1"},
+                    "success": True,
+                }
+            else:
+                response.json.return_value = {
+                    "data": {
+                        "finished": True,
+                        "num_dir": 1,
+                        "num_file": 5,
+                        "total_size": 500,
+                    },
+                    "success": True,
+                }
+            return response
+
+        mock_request = make_request(AsyncMock(side_effect=mock_get))
+        indexed = SynoFolderSizeIndexEntry(
+            mtime=100, measured_at=time.time(), num_dir=3, num_file=30, total_size=3000
+        )
+        set_hashes(mock_request, index={"/media/movies": indexed.model_dump_json()})
+
+        result = await retrieve_folders_info(mock_request, folder="/media")
+
+        sizes = {folder.name: folder.total_size for folder in result.folders}
+        assert sizes == {"movies": 3000, "tv": 500}
+        assert len(measured_paths) == 1
+        assert "/media/tv" in measured_paths[0]
+
+        # Verify only the new measurement is written back to the index
+        mock_request.app.state.redis.hset.assert_called_once()
+        _, kwargs = mock_request.app.state.redis.hset.call_args
+        assert list(kwargs["mapping"]) == ["/media/tv"]
+        assert mock_request.app.state.redis.hset.call_args.args == (
+            NAS_FOLDER_SIZE_INDEX_KEY,
+        )
+
+    async def test_task_is_stopped_when_polling_fails(self):
+        """Test a DirSize task is stopped even if polling it fails"""
+        stopped = []
+
+        async def mock_get(url, **kwargs):
+            response = MagicMock()
+            if "method=list" in url:
+                response.json.return_value = {
+                    "data": {
+                        "files": [make_folder("movies", 100)],
+                        "offset": 0,
+                        "total": 1,
+                    },
+                    "success": True,
+                }
+            elif "method=start" in url:
+                response.json.return_value = {
+                    "data": {"taskid": "task-1"},
+                    "success": True,
+                }
+            elif "method=status" in url:
+                raise httpx.ReadTimeout("timed out")
+            else:
+                stopped.append(url)
+                response.json.return_value = {"success": True}
+            return response
+
+        mock_request = make_request(AsyncMock(side_effect=mock_get))
+        set_hashes(mock_request)
+
+        with pytest.raises(httpx.ReadTimeout):
+            await retrieve_folders_info(mock_request, folder="/media")
+
+        assert len(stopped) == 1
+        assert "task-1" in stopped[0]
+
+    async def test_first_poll_waits_for_previous_duration(self, monkeypatch):
+        """Test a folder is first polled part way into its last measurement"""
+        mock_sleep = AsyncMock()
+        monkeypatch.setattr("api.nas.retrieval.sleep", mock_sleep)
+        status = {"finished": True, "num_dir": 1, "num_file": 5, "total_size": 500}
+        mock_request = make_request(make_folders_get(status))
+        indexed = SynoFolderSizeIndexEntry(
+            mtime=50,
+            measured_at=time.time(),
+            num_dir=1,
+            num_file=4,
+            total_size=400,
+            duration=12.5,
+        )
+        set_hashes(mock_request, index={"/media/movies": indexed.model_dump_json()})
+
+        result = await retrieve_folders_info(mock_request, folder="/media")
+
+        assert result.folders[0].total_size == 500
+        mock_sleep.assert_awaited_once_with(6.25)
+        # Verify the stored duration moves towards the faster measurement
+        _, kwargs = mock_request.app.state.redis.hset.call_args
+        stored = SynoFolderSizeIndexEntry.model_validate_json(
+            kwargs["mapping"]["/media/movies"]
+        )
+        assert stored.duration == pytest.approx(6.25, abs=0.1)
+
+    async def test_slow_folder_returns_progress(self, monkeypatch):
+        """Test a task running past the timeout is left running and its progress returned"""
+        monkeypatch.setattr("api.nas.retrieval.NAS_FOLDER_SIZE_TIMEOUT", 0)
+        status = {"finished": False, "num_dir": 2, "num_file": 20, "total_size": 200}
+        mock_get = make_folders_get(status)
+        mock_request = make_request(mock_get)
+        set_hashes(mock_request)
+
+        result = await retrieve_folders_info(mock_request, folder="/media")
+
+        assert result.folders[0].partial is True
+        assert result.folders[0].total_size == 200
+        assert requested_methods(mock_get) == ["start", "status"]
+        # Verify the task is recorded for the next refresh, not indexed
+        mock_request.app.state.redis.hset.assert_called_once()
+        assert mock_request.app.state.redis.hset.call_args.args == (
+            NAS_FOLDER_SIZE_TASKS_KEY,
+        )
+
+    async def test_unfinished_task_keeps_last_complete_size(self, monkeypatch):
+        """Test a folder being re-measured is served from its last complete size"""
+        monkeypatch.setattr("api.nas.retrieval.NAS_FOLDER_SIZE_TIMEOUT", 0)
+        status = {"finished": False, "num_dir": 2, "num_file": 20, "total_size": 200}
+        mock_request = make_request(make_folders_get(status))
+        indexed = SynoFolderSizeIndexEntry(
+            mtime=50, measured_at=time.time(), num_dir=3, num_file=30, total_size=3000
+        )
+        set_hashes(mock_request, index={"/media/movies": indexed.model_dump_json()})
+
+        result = await retrieve_folders_info(mock_request, folder="/media")
+
+        assert result.folders[0].partial is False
+        assert result.folders[0].total_size == 3000
+
+    async def test_resumes_task_left_running(self, monkeypatch):
+        """Test a task left running by an earlier refresh is polled, not restarted"""
+        monkeypatch.setattr("api.nas.retrieval.sleep", AsyncMock())
+        status = {"finished": True, "num_dir": 1, "num_file": 5, "total_size": 500}
+        mock_get = make_folders_get(status)
+        mock_request = make_request(mock_get)
+        pending = SynoFolderSizeTask(
+            task_id="task-0", mtime=100, started_at=time.time() - 120
+        )
+        set_hashes(mock_request, tasks={"/media/movies": pending.model_dump_json()})
+
+        result = await retrieve_folders_info(mock_request, folder="/media")
+
+        assert result.folders[0].total_size == 500
+        assert requested_methods(mock_get) == ["status", "stop"]
+        # Verify the whole run is recorded as the folder's duration
+        _, kwargs = mock_request.app.state.redis.hset.call_args
+        stored = SynoFolderSizeIndexEntry.model_validate_json(
+            kwargs["mapping"]["/media/movies"]
+        )
+        assert stored.duration == pytest.approx(120, abs=1)
+        mock_request.app.state.redis.hdel.assert_awaited_once_with(
+            NAS_FOLDER_SIZE_TASKS_KEY, "/media/movies"
+        )
@@ -0,0 +1,175 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+from fastapi import Response
+from fastapi.testclient import TestClient
+
+from api.main import api
+from api.npm.models import NPMBatchResponse, NPMDownloads, NPMPackageInfo
+from api.npm.retrieval import retrieve_package_info, retrieve_packages_info
+
+
+def make_registry_data(name: str) -> dict:
+    """Create registry metadata for the latest version of a package"""
+    return {
+        "name": name,
+        "version": "1.0.0",
+        "description": f"The {name} package",
+        "license": "MIT",
+        "homepage": f"https://github.com/test/{name}",
+        "repository": {"url": f"git+https://github.com/test/{name}.git"},
+        "bugs": {"url": f"https://github.com/test/{name}/issues"},
+    }
+
+
+def make_range_data(total: int) -> dict:
+    """Create a downloads range with one day"""
+    return {
+        "start": "2024-01-01",
+        "end": "2024-01-31",
+        "downloads": [{"day": "2024-01-01", "downloads": total}],
+    }
+
+
+@pytest.mark.asyncio
+class TestNPMBatchRetrieval:
+    """Test retrieving many NPM packages at once"""
+
+    async def test_bulk_downloads_and_per_package_cache(self):
+        """Test unscoped packages share bulk requests and each package is cached"""
+        urls = []
+
+        async def mock_get(url, **kwargs):
+            urls.append(url)
+            response = MagicMock()
+            if url.startswith("https://registry.npmjs.org/"):
+                name = url.removeprefix("https://registry.npmjs.org/")
+                response.json.return_value = make_registry_data(
+                    name.removesuffix("/latest")
+                )
+            elif url.endswith("/last-month/a,b") and "/point/" in url:
+                response.json.return_value = {
+                    "a": {"downloads": 10},
+                    "b": {"downloads": 20},
+                }
+            elif url.endswith("/last-month/a,b"):
+                response.json.return_value = {
+                    "a": make_range_data(10),
+                    "b": make_range_data(20),
+                }
+            elif "/point/" in url:
+                response.json.return_value = {"downloads": 30}
+            else:
+                response.json.return_value = make_range_data(30)
+            return response
+
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = None
+
+        mock_request = MagicMock()
+        mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = AsyncMock(side_effect=mock_get)
+
+        result = await retrieve_packages_info(
+            mock_request, package_names=["@scope/c", "a", "b"]
+        )
+
+        assert isinstance(result, NPMBatchResponse)
+        totals = {package.name: package.downloads.total for package in result.packages}
+        assert totals == {"@scope/c": 30, "a": 10, "b": 20}
+        assert result.packages[1].downloads.per_day[0].downloads == 10
+
+        # Verify 3 registry calls plus a bulk and a scoped call per downloads kind
+        assert len(urls) == 7
+
+        cached_keys = {call.args[0] for call in mock_redis.set.call_args_list}
+        assert 'npm:package:[]:{"package_name": "a"}' in cached_keys
+        assert 'npm:package:[]:{"package_name": "@scope/c"}' in cached_keys
+
+    async def test_fetches_only_uncached_packages(self):
+        """Test cached packages are reused and an unknown package is reported"""
+        cached = NPMPackageInfo(
+            **{
+                **make_registry_data("a"),
+                "repository": "https://github.com/test/a",
+                "issues": "https://github.com/test/a/issues",
+                "pulls": "https://github.com/test/a/pulls",
+            },
+            downloads=NPMDownloads(total=10, start=None, end=None),
+        )
+        store = {'npm:package:[]:{"package_name": "a"}': cached.model_dump_json()}
+        urls = []
+
+        async def mock_get(url, **kwargs):
+            urls.append(url)
+            response = MagicMock()
+            if url.startswith("https://registry.npmjs.org/"):
+                response.raise_for_status.side_effect = httpx.HTTPStatusError(
+                    "404 Not Found", request=MagicMock(), response=MagicMock()
+                )
+            else:
+                response.json.return_value = {"error": "package b not found"}
+            return response
+
+        mock_redis = AsyncMock()
+        mock_redis.get.side_effect = lambda key: store.get(key)
+        mock_redis.ttl.return_value = 60
+
+        mock_request = MagicMock()
+        mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = AsyncMock(side_effect=mock_get)
+
+        result = await retrieve_packages_info(mock_request, package_names=["a", "b"])
+
+        assert [package.name for package in result.packages] == ["a"]
+        assert list(result.errors) == ["b"]
+        # Verify nothing was requested for the cached package
+        assert all(not url.endswith("/a/latest") for url in urls)
+        assert all(not url.endswith("/a") for url in urls)
+
+
+@pytest.mark.asyncio
+class TestNPMPackageRetrieval:
+    """Test retrieving a single NPM package"""
+
+    async def test_downloads_fall_back_on_invalid_json(self):
+        """Test a non-JSON downloads reply leaves the downloads empty"""
+
+        async def mock_get(url, **kwargs):
+            response = MagicMock()
+            if url.startswith("https://registry.npmjs.org/"):
+                response.json.return_value = make_registry_data("a")
+            else:
+                response.json.side_effect = ValueError("Expecting value")
+            return response
+
+        mock_redis = AsyncMock()
+        mock_redis.get.return_value = None
+
+        mock_request = MagicMock()
+        mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = AsyncMock(side_effect=mock_get)
+
+        result = await retrieve_package_info(mock_request, package_name="a")
+
+        assert result.name == "a"
+        assert result.downloads.total is None
+        assert result.downloads.per_day == []
+
+
+class TestNPMRouter:
+    """Test the NPM routes"""
+
+    def test_package_named_batch_is_not_shadowed(self):
+        """Test the real npm package named batch is served by the package route"""
+        mock_response = AsyncMock(
+            return_value=Response(b'{"name": "batch"}', media_type="application/json")
+        )
+        with patch(
+            "api.npm.router.retrieve_package_info.response", mock_response
+        ), patch("api.npm.router.retrieve_packages_info.response", AsyncMock()):
+            response = TestClient(api).get("/npm/batch/")
+
+        assert response.status_code == 200
+        assert mock_response.call_args.kwargs == {"package_name": "batch"}
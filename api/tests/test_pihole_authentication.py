@@ -0,0 +1,86 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import pytest
+
+from api.pihole.authentication import PIHOLE_SID_KEY, pihole_session
+
+
+def make_request(store: dict, ttl: int = 1800) -> MagicMock:
+    """Create a mock request whose redis reads and writes the given dict"""
+    mock_redis = AsyncMock()
+    mock_redis.get.side_effect = lambda key: store.get(key)
+    mock_redis.set.side_effect = lambda key, value, **kwargs: store.update({key: value})
+    mock_redis.delete.side_effect = lambda key: store.pop(key, None)
+    mock_redis.ttl.return_value = ttl
+    mock_redis.lock = MagicMock(return_value=AsyncMock())
+
+    login_response = MagicMock()
+    login_response.json.return_value = {
+        "session": {"valid": True, "sid": "new-sid", "validity": 1800}
+    }
+
+    mock_request = MagicMock()
+    mock_request.app.state.redis = mock_redis
+    mock_request.app.state.http.post = AsyncMock(return_value=login_response)
+    return mock_request
+
+
+@pytest.mark.asyncio
+class TestPiholeSession:
+    """Test the shared Pi-hole session manager"""
+
+    async def test_reuses_shared_sid(self):
+        """Test a SID held in Redis is used without logging in"""
+        store = {PIHOLE_SID_KEY: json.dumps({"sid": "shared-sid", "validity": 1800})}
+        mock_request = make_request(store)
+
+        @pihole_session
+        async def test_func(request, sid):
+            return sid
+
+        result = await test_func(mock_request)
+
+        assert result == "shared-sid"
+        mock_request.app.state.http.post.assert_not_called()
+        mock_request.app.state.redis.expire.assert_called_once_with(
+            PIHOLE_SID_KEY, 1800
+        )
+
+    async def test_renews_sid_close_to_expiry(self):
+        """Test a SID about to time out is proactively replaced"""
+        store = {PIHOLE_SID_KEY: json.dumps({"sid": "old-sid", "validity": 1800})}
+        mock_request = make_request(store, ttl=10)
+
+        @pihole_session
+        async def test_func(request, sid):
+            return sid
+
+        result = await test_func(mock_request)
+
+        assert result == "new-sid"
+        mock_request.app.state.http.post.assert_called_once()
+
+    async def test_logs_in_again_on_401(self):
+        """Test a rejected SID is replaced and the call retried once"""
+        store = {PIHOLE_SID_KEY: json.dumps({"sid": "stale-sid", "validity": 1800})}
+        mock_request = make_request(store)
+        sids_seen = []
+
+        @pihole_session
+        async def test_func(request, sid):
+            sids_seen.append(sid)
+            if sid == "stale-sid":
+                response = MagicMock()
+                response.status_code = 401
+                raise httpx.HTTPStatusError(
+                    "401 Unauthorized", request=MagicMock(), response=response
+                )
+            return sid
+
+        result = await test_func(mock_request)
+
+        assert result == "new-sid"
+        assert sids_seen == ["stale-sid", "new-sid"]
+        assert json.loads(store[PIHOLE_SID_KEY])["sid"] == "new-sid"
@@ -0,0 +1,126 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from api.plex.models import PlexPlayer, PlexSession, PlexSessionsResponse
+from api.plex.notifications import (
+    PLEX_NOTIFICATIONS_RETRY,
+    PlexSessionTable,
+    _handle_message,
+    listen_for_plex_sessions,
+)
+
+
+def make_session(session_key: str, state: str = "playing") -> PlexSession:
+    """Create a session as parsed from /status/sessions"""
+    return PlexSession(
+        session_key=session_key,
+        username="testuser",
+        title="Test Movie",
+        media_type="movie",
+        player=PlexPlayer(
+            title="Living Room TV", platform="Roku", product="Plex", state=state
+        ),
+        progress_percent=10.0,
+        duration_ms=1000,
+        view_offset_ms=100,
+    )
+
+
+def make_message(*notifications: dict) -> str:
+    """Create a websocket message with play state notifications"""
+    return json.dumps(
+        {
+            "NotificationContainer": {
+                "type": "playing",
+                "PlaySessionStateNotification": list(notifications),
+            }
+        }
+    )
+
+
+class TestPlexSessionTable:
+    """Test applying play state notifications to the session table"""
+
+    def test_updates_known_session(self):
+        """Test a known session's state and progress are updated in place"""
+        table = PlexSessionTable()
+        table.replace(PlexSessionsResponse(count=1, sessions=[make_session("1")]))
+
+        in_sync = table.apply({"sessionKey": "1", "state": "paused", "viewOffset": 500})
+
+        session = table.response().sessions[0]
+        assert in_sync is True
+        assert session.player.state == "paused"
+        assert session.view_offset_ms == 500
+        assert session.progress_percent == 50.0
+
+    def test_removes_stopped_session(self):
+        """Test a stopped session is dropped from the table"""
+        table = PlexSessionTable()
+        table.replace(PlexSessionsResponse(count=1, sessions=[make_session("1")]))
+
+        assert table.apply({"sessionKey": "1", "state": "stopped"}) is True
+        assert table.response().count == 0
+
+    def test_unknown_session_needs_resync(self):
+        """Test a session missing from the table asks for a resync"""
+        table = PlexSessionTable()
+
+        assert table.apply({"sessionKey": "2", "state": "playing"}) is False
+
+
+@pytest.mark.asyncio
+class TestPlexNotificationHandler:
+    """Test handling Plex notification websocket messages"""
+
+    async def test_new_session_resyncs_from_plex(self, mocker):
+        """Test an unknown session is fetched and the cache updated"""
+        fetched = PlexSessionsResponse(count=1, sessions=[make_session("2")])
+        mocker.patch(
+            "api.plex.notifications.fetch_sessions", AsyncMock(return_value=fetched)
+        )
+        mock_store = mocker.patch(
+            "api.plex.notifications.retrieve_sessions.store", AsyncMock()
+        )
+        mock_request = MagicMock()
+        table = PlexSessionTable()
+
+        await _handle_message(
+            mock_request, table, make_message({"sessionKey": "2", "state": "playing"})
+        )
+
+        mock_store.assert_awaited_once()
+        assert mock_store.call_args.args[1].sessions[0].session_key == "2"
+
+    async def test_other_notifications_are_ignored(self, mocker):
+        """Test notifications other than play state changes are skipped"""
+        mock_store = mocker.patch(
+            "api.plex.notifications.retrieve_sessions.store", AsyncMock()
+        )
+        message = json.dumps({"NotificationContainer": {"type": "timeline"}})
+
+        await _handle_message(MagicMock(), PlexSessionTable(), message)
+
+        mock_store.assert_not_called()
+
+    async def test_listener_reconnects_after_redis_error(self, mocker):
+        """Test a Redis failure backs off and reconnects instead of ending the task"""
+        mocker.patch("api.plex.notifications.websockets.connect")
+        mocker.patch(
+            "api.plex.notifications.fetch_sessions",
+            AsyncMock(side_effect=RedisConnectionError("connection lost")),
+        )
+        # stop the loop once it goes to sleep before reconnecting
+        mock_sleep = mocker.patch(
+            "api.plex.notifications.asyncio.sleep",
+            AsyncMock(side_effect=asyncio.CancelledError),
+        )
+
+        with pytest.raises(asyncio.CancelledError):
+            await listen_for_plex_sessions(MagicMock())
+
+        mock_sleep.assert_awaited_once_with(PLEX_NOTIFICATIONS_RETRY)
@@ -1,7 +1,7 @@
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock
 
+import httpx
 import pytest
-import requests
 from fastapi import HTTPException
 
 from api.plex.models import (
@@ -20,9 +20,10 @@ from api.plex.retrieval import (
 class TestPlexHealthRetrieval:
     """Test Plex health retrieval functions"""
 
-    @patch("api.plex.retrieval.requests.get")
-    async def test_retrieve_health_success(self, mock_get):
+    async def test_retrieve_health_success(self):
         """Test successful retrieval of Plex server health"""
+        mock_get = AsyncMock()
+
         mock_response = MagicMock()
         mock_response.json.return_value = {
             "MediaContainer": {
@@ -39,9 +40,11 @@ class TestPlexHealthRetrieval:
 
         mock_redis = AsyncMock()
         mock_redis.get.return_value = None
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
 
         mock_request = MagicMock()
         mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
 
         result = await retrieve_health(mock_request)
 
@@ -51,16 +54,19 @@ class TestPlexHealthRetrieval:
         assert result.platform == "Linux"
         assert result.claimed is True
 
-    @patch("api.plex.retrieval.requests.get")
-    async def test_retrieve_health_connection_error(self, mock_get):
+    async def test_retrieve_health_connection_error(self):
         """Test handling of connection errors for health check"""
-        mock_get.side_effect = requests.exceptions.ConnectionError("Connection refused")
+        mock_get = AsyncMock()
+
+        mock_get.side_effect = httpx.ConnectError("Connection refused")
 
         mock_redis = AsyncMock()
         mock_redis.get.return_value = None
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
 
         mock_request = MagicMock()
         mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
 
         with pytest.raises(HTTPException) as exc_info:
             await retrieve_health(mock_request)
@@ -73,9 +79,10 @@ class TestPlexHealthRetrieval:
 class TestPlexSessionsRetrieval:
     """Test Plex sessions retrieval functions"""
 
-    @patch("api.plex.retrieval.requests.get")
-    async def test_retrieve_sessions_success(self, mock_get):
+    async def test_retrieve_sessions_success(self):
         """Test successful retrieval of active Plex sessions"""
+        mock_get = AsyncMock()
+
         mock_response = MagicMock()
         mock_response.json.return_value = {
             "MediaContainer": {
@@ -104,9 +111,11 @@ class TestPlexSessionsRetrieval:
 
         mock_redis = AsyncMock()
         mock_redis.get.return_value = None
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
 
         mock_request = MagicMock()
         mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
 
         result = await retrieve_sessions(mock_request)
 
@@ -119,9 +128,10 @@ class TestPlexSessionsRetrieval:
         assert result.sessions[0].player.title == "Living Room TV"
         assert result.sessions[0].progress_percent == 50.0
 
-    @patch("api.plex.retrieval.requests.get")
-    async def test_retrieve_sessions_empty(self, mock_get):
+    async def test_retrieve_sessions_empty(self):
         """Test retrieval when no active sessions"""
+        mock_get = AsyncMock()
+
         mock_response = MagicMock()
         mock_response.json.return_value = {
             "MediaContainer": {
@@ -133,9 +143,11 @@ class TestPlexSessionsRetrieval:
 
         mock_redis = AsyncMock()
         mock_redis.get.return_value = None
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
 
         mock_request = MagicMock()
         mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
 
         result = await retrieve_sessions(mock_request)
 
@@ -143,9 +155,10 @@ class TestPlexSessionsRetrieval:
         assert result.count == 0
         assert len(result.sessions) == 0
 
-    @patch("api.plex.retrieval.requests.get")
-    async def test_retrieve_sessions_episode(self, mock_get):
+    async def test_retrieve_sessions_episode(self):
         """Test retrieval of TV episode session"""
+        mock_get = AsyncMock()
+
         mock_response = MagicMock()
         mock_response.json.return_value = {
             "MediaContainer": {
@@ -175,9 +188,11 @@ class TestPlexSessionsRetrieval:
 
         mock_redis = AsyncMock()
         mock_redis.get.return_value = None
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
 
         mock_request = MagicMock()
         mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
 
         result = await retrieve_sessions(mock_request)
 
@@ -185,16 +200,19 @@ class TestPlexSessionsRetrieval:
         assert result.sessions[0].parent_title == "Season 1"
         assert result.sessions[0].player.state == "paused"
 
-    @patch("api.plex.retrieval.requests.get")
-    async def test_retrieve_sessions_connection_error(self, mock_get):
+    async def test_retrieve_sessions_connection_error(self):
         """Test handling of connection errors for sessions"""
-        mock_get.side_effect = requests.exceptions.ConnectionError("Connection refused")
+        mock_get = AsyncMock()
+
+        mock_get.side_effect = httpx.ConnectError("Connection refused")
 
         mock_redis = AsyncMock()
         mock_redis.get.return_value = None
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
 
         mock_request = MagicMock()
         mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
 
         with pytest.raises(HTTPException) as exc_info:
             await retrieve_sessions(mock_request)
@@ -206,9 +224,9 @@ class TestPlexSessionsRetrieval:
 class TestPlexLibraryCountsRetrieval:
     """Test Plex library counts retrieval functions"""
 
-    @patch("api.plex.retrieval.requests.get")
-    async def test_retrieve_library_counts_success(self, mock_get):
+    async def test_retrieve_library_counts_success(self):
         """Test successful retrieval of library counts"""
+        mock_get = AsyncMock()
 
         def mock_get_response(url, **kwargs):
             mock_response = MagicMock()
@@ -239,9 +257,11 @@ class TestPlexLibraryCountsRetrieval:
 
         mock_redis = AsyncMock()
         mock_redis.get.return_value = None
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
 
         mock_request = MagicMock()
         mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
 
         result = await retrieve_library_counts(mock_request)
 
@@ -255,36 +275,42 @@ class TestPlexLibraryCountsRetrieval:
         assert result.sections[2].title == "Music"
         assert result.sections[2].count == 1000
 
-    @patch("api.plex.retrieval.requests.get")
-    async def test_retrieve_library_counts_connection_error(self, mock_get):
+    async def test_retrieve_library_counts_connection_error(self):
         """Test handling of connection errors for library counts"""
-        mock_get.side_effect = requests.exceptions.ConnectionError("Connection refused")
+        mock_get = AsyncMock()
+
+        mock_get.side_effect = httpx.ConnectError("Connection refused")
 
         mock_redis = AsyncMock()
         mock_redis.get.return_value = None
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
 
         mock_request = MagicMock()
         mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
 
         with pytest.raises(HTTPException) as exc_info:
             await retrieve_library_counts(mock_request)
 
         assert exc_info.value.status_code == 503
 
-    @patch("api.plex.retrieval.requests.get")
-    async def test_retrieve_library_counts_http_error(self, mock_get):
+    async def test_retrieve_library_counts_http_error(self):
         """Test handling of HTTP errors for library counts"""
+        mock_get = AsyncMock()
+
         mock_response = MagicMock()
-        mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
-            "401 Unauthorized"
+        mock_response.raise_for_status.side_effect = httpx.HTTPStatusError(
+            "401 Unauthorized", request=MagicMock(), response=MagicMock()
         )
         mock_get.return_value = mock_response
 
         mock_redis = AsyncMock()
         mock_redis.get.return_value = None
+        mock_redis.lock = MagicMock(return_value=AsyncMock())
 
         mock_request = MagicMock()
         mock_request.app.state.redis = mock_redis
+        mock_request.app.state.http.get = mock_get
 
         with pytest.raises(HTTPException) as exc_info:
             await retrieve_library_counts(mock_request)
@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+import pytest
+
+from api.utils.upstream import UpstreamClient
+
+
+@pytest.mark.asyncio
+class TestUpstreamClient:
+    """Test the shared upstream HTTP client"""
+
+    async def test_get_returns_response(self):
+        """Test requests are sent through the pooled client"""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={"path": request.url.path})
+
+        client = UpstreamClient(transport=httpx.MockTransport(handler))
+        try:
+            r = await client.get("https://example.com/status")
+        finally:
+            await client.aclose()
+
+        assert r.status_code == 200
+        assert r.json() == {"path": "/status"}
+
+    async def test_follows_redirects(self):
+        """Test redirects are followed like requests did, e.g. for a renamed user"""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.path == "/users/old":
+                return httpx.Response(301, headers={"Location": "/users/new"})
+            return httpx.Response(200, json=[{"path": request.url.path}])
+
+        client = UpstreamClient(transport=httpx.MockTransport(handler))
+        try:
+            r = await client.get("https://example.com/users/old")
+        finally:
+            await client.aclose()
+
+        assert r.status_code == 200
+        assert r.json() == [{"path": "/users/new"}]
+
+    async def test_per_host_limit(self):
+        """Test concurrent requests to one host are capped"""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200)
+
+        client = UpstreamClient(
+            host_limits={"nas.local": 2},
+            transport=httpx.MockTransport(handler),
+        )
+        try:
+            await asyncio.gather(
+                *[client.get("https://nas.local/", verify=False) for _ in range(6)]
+            )
+        finally:
+            await client.aclose()
+
+        assert max_in_flight == 2
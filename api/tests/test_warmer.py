@@ -0,0 +1,99 @@
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from api.utils.cache import CacheRegistration, cache_registry
+from api.utils.warmer import CacheWarmer
+
+
+@pytest.fixture(autouse=True)
+def clear_cache_registry():
+    """Start every test with no registered cache keys"""
+    cache_registry.clear()
+    yield
+    cache_registry.clear()
+
+
+@pytest.mark.asyncio
+class TestCacheWarmer:
+    """Test the background cache warmer"""
+
+    async def test_refreshes_keys_about_to_expire(self):
+        """Test only keys within the lead time of expiry are refreshed"""
+        now = time.monotonic()
+        expiring = CacheRegistration(
+            key="test:expiring", ttl=60, refresh=AsyncMock(), fresh_until=now + 1
+        )
+        fresh = CacheRegistration(
+            key="test:fresh", ttl=60, refresh=AsyncMock(), fresh_until=now + 50
+        )
+        cache_registry["test:expiring:[]:{}"] = expiring
+        cache_registry["test:fresh:[]:{}"] = fresh
+
+        mock_app = MagicMock()
+        mock_app.state.redis.ttl = AsyncMock(return_value=1)
+        warmer = CacheWarmer(mock_app)
+        due = warmer.due(now)
+
+        assert [cache_key for cache_key, _ in due] == ["test:expiring:[]:{}"]
+
+        await warmer.refresh(*due[0])
+        expiring.refresh.assert_awaited_once()
+
+        # Verify the key is not retried straight away
+        assert warmer.due(time.monotonic()) == []
+
+    async def test_failing_source_backs_off(self):
+        """Test a failure backs off every key from the same source"""
+        now = time.monotonic()
+        failing = CacheRegistration(
+            key="nas:system",
+            ttl=60,
+            refresh=AsyncMock(side_effect=Exception("boom")),
+        )
+        sibling = CacheRegistration(key="nas:folders", ttl=60, refresh=AsyncMock())
+        cache_registry["nas:system:[]:{}"] = failing
+
+        mock_app = MagicMock()
+        mock_app.state.redis.ttl = AsyncMock(return_value=-2)
+        warmer = CacheWarmer(mock_app, min_backoff=10)
+        await warmer.refresh("nas:system:[]:{}", failing)
+        cache_registry["nas:folders:[]:{}"] = sibling
+
+        assert warmer.due(now) == []
+        assert "nas:folders:[]:{}" in [
+            cache_key for cache_key, _ in warmer.due(now + 11)
+        ]
+
+    async def test_skips_keys_refreshed_by_another_worker(self):
+        """Test a key another worker already refreshed is not fetched again"""
+        now = time.monotonic()
+        registration = CacheRegistration(
+            key="test:shared",
+            ttl=60,
+            stale_ttl=60,
+            refresh=AsyncMock(),
+            fresh_until=now + 1,
+        )
+        cache_registry["test:shared:[]:{}"] = registration
+
+        mock_app = MagicMock()
+        mock_app.state.redis.ttl = AsyncMock(return_value=115)
+        warmer = CacheWarmer(mock_app)
+        await warmer.refresh("test:shared:[]:{}", registration)
+
+        registration.refresh.assert_not_awaited()
+        # Verify the key is scheduled from the other worker's save
+        assert registration.fresh_until == pytest.approx(now + 55, abs=1)
+
+    async def test_idle_keys_are_dropped(self):
+        """Test keys nobody requested recently stop being warmed"""
+        registration = CacheRegistration(key="test:idle", ttl=60, refresh=AsyncMock())
+        registration.last_requested = time.monotonic() - 2 * 60 * 60
+        cache_registry["test:idle:[]:{}"] = registration
+
+        warmer = CacheWarmer(MagicMock())
+
+        assert warmer.due(time.monotonic()) == []
+        assert "test:idle:[]:{}" not in cache_registry
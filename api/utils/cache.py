@@ -1,40 +1,408 @@
+import asyncio
+import hashlib
 import json
 import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from functools import wraps
-from typing import Callable
+from typing import Any, Awaitable, Callable, Iterator
+from uuid import uuid4
 
-from fastapi import Depends, Request
+from fastapi import Depends, Request, Response, status
 from pydantic import BaseModel, ValidationError
+from redis.asyncio import Redis
+from redis.exceptions import LockError, RedisError
+
+from api.utils.local_cache import LocalCache
 
 logger = logging.getLogger(__name__)
 
+LOCK_POLL_INTERVAL = 0.1
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# L1: already-validated models, kept coherent across workers via INVALIDATION_CHANNEL
+local_cache = LocalCache()
+cache_stats: dict[str, Counter] = {"l1": Counter(), "l2": Counter()}
+_worker_id = uuid4().hex
+
+
+@dataclass
+class CachedResult:
+    """A validated model kept in L1 together with its serialized JSON body."""
+
+    model: BaseModel
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_body(cls, model: BaseModel, body: bytes | str) -> "CachedResult":
+        if isinstance(body, str):
+            body = body.encode()
+        # weak, GZipMiddleware may send the same body in another encoding
+        etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        return cls(model=model, body=body, etag=etag)
+
+
+@dataclass
+class CacheRegistration:
+    """A concrete cache key that has been requested, used by the cache warmer."""
+
+    key: str
+    ttl: int
+    refresh: Callable[[Request], Awaitable[BaseModel]]
+    stale_ttl: int = 0
+    fresh_until: float = 0.0
+    last_requested: float = field(default_factory=time.monotonic)
+
+    @property
+    def source(self) -> str:
+        return self.key.split(":")[0]
+
+
+# every cache key requested in this process, keyed by the full cache key
+cache_registry: dict[str, CacheRegistration] = {}
+
+# strong references to in-flight revalidation tasks so they are not garbage collected
+_background_tasks: set[asyncio.Task] = set()
+# one upstream fetch per cache key at a time, shared by every caller in this process
+_in_flight: dict[str, asyncio.Task] = {}
+# queues receiving every changed cache key, one per subscriber (e.g. an SSE client)
+_update_subscribers: set[asyncio.Queue] = set()
+
+
+def _is_stale(remaining_ttl: int, stale_ttl: int) -> bool:
+    # -1: the key has no expiry, -2: the key expired since it was read
+    return remaining_ttl != -1 and remaining_ttl <= stale_ttl
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match uses weak comparison, W/"x" matches "x"
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def _forget_in_flight(cache_key: str, task: asyncio.Task) -> None:
+    if _in_flight.get(cache_key) is task:
+        del _in_flight[cache_key]
+    # mark the exception as retrieved, the callers awaiting the task log it
+    if not task.cancelled():
+        task.exception()
+
+
+def _notify_subscribers(cache_key: str) -> None:
+    for queue in _update_subscribers:
+        try:
+            queue.put_nowait(cache_key)
+        except asyncio.QueueFull:
+            logger.warning(f"Dropping update of {cache_key} for a slow subscriber")
+
+
+@contextmanager
+def subscribe_to_updates(maxsize: int = 100) -> Iterator[asyncio.Queue]:
+    """Receive the key of every cache entry changed by any worker."""
+    queue: asyncio.Queue = asyncio.Queue(maxsize)
+    _update_subscribers.add(queue)
+    try:
+        yield queue
+    finally:
+        _update_subscribers.discard(queue)
+
+
+async def _publish_invalidation(redis: Redis, cache_key: str) -> None:
+    await redis.publish(INVALIDATION_CHANNEL, f"{_worker_id} {cache_key}")
+
+
+async def invalidate(redis: Redis, cache_key: str = "*") -> None:
+    """Drop a key (or every key with ``*``) from the L1 cache of all workers."""
+    if cache_key == "*":
+        local_cache.clear()
+    else:
+        local_cache.delete(cache_key)
+    await _publish_invalidation(redis, cache_key)
+
+
+async def listen_for_invalidations(redis: Redis) -> None:
+    """Evict L1 entries changed by other workers and notify update subscribers.
+
+    Runs for the app lifetime.
+    """
+    while True:
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # messages may have been missed while (re)connecting
+                local_cache.clear()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    worker_id, _, cache_key = message["data"].decode().partition(" ")
+                    _notify_subscribers(cache_key)
+                    if worker_id == _worker_id:
+                        continue
+                    if cache_key == "*":
+                        local_cache.clear()
+                    else:
+                        local_cache.delete(cache_key)
+        except (ConnectionError, RedisError) as e:
+            logger.warning(f"Cache invalidation listener disconnected: {e}")
+            await asyncio.sleep(1)
+
+
+async def _single_flight(cache_key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """Run ``fetch`` once per cache key, concurrent callers await the same result.
+
+    The fetch runs in its own task so a disconnecting caller does not cancel it
+    for everyone else waiting on the key.
+    """
+    task = _in_flight.get(cache_key)
+    if task is None:
+        task = asyncio.create_task(fetch())
+        _in_flight[cache_key] = task
+        task.add_done_callback(lambda t: _forget_in_flight(cache_key, t))
+    else:
+        logger.info(f"Joining in-flight fetch for {cache_key}")
+    return await asyncio.shield(task)
+
+
+def cache(
+    key: str,
+    response_model: BaseModel,
+    ttl: int = 3600,
+    stale_ttl: int = 0,
+    lock_ttl: int = 0,
+    result_ttl: Callable[[BaseModel], int] | None = None,
+):
+    """Cache the result of an async retriever in Redis.
+
+    Hits are served from an in-process LRU of validated models first (L1), then
+    from Redis (L2). L1 entries expire with the Redis key and are evicted on other
+    workers through pub/sub whenever a key is recomputed.
+
+    Concurrent misses for the same key within a process share one call to the
+    retriever. With ``lock_ttl`` set, misses also take a Redis lock (held for at
+    most ``lock_ttl`` seconds) so other workers wait for the result instead of
+    calling the upstream themselves.
+
+    With ``stale_ttl`` set, values are kept for ``ttl + stale_ttl`` seconds. Once
+    ``ttl`` has passed the stale value is returned immediately and refreshed in
+    a background task (stale-while-revalidate).
+
+    ``result_ttl`` returns the ``ttl`` to use for a given result instead, e.g. to
+    keep a partial result only briefly.
+
+    Results obtained some other way (a push notification, a batched upstream
+    query) can be cached with ``retriever.store(request, result, *args, **kwargs)``,
+    ``retriever.lookup(request, *args, **kwargs)`` returns the cached result (or
+    None) without calling the retriever.
+
+    Routes should return ``retriever.response(request, *args, **kwargs)``, which
+    answers L1 hits with the JSON body kept next to the model instead of having
+    FastAPI validate and encode the model again. The response carries an ``ETag``
+    (a hash of the body, answered with a 304 on ``If-None-Match``) and
+    ``Cache-Control: no-cache`` so clients always revalidate.
+    """
 
-def cache(key: str, response_model: BaseModel, ttl: int = 3600):
     def decorator(func: Callable):
-        @wraps(func)
-        async def wrapper(request: Request = Depends(), *args, **kwargs):
-            cache_key = f"{key}:{json.dumps(args)}:{json.dumps(kwargs)}"
+        def make_key(args: tuple, kwargs: dict) -> str:
+            return f"{key}:{json.dumps(args)}:{json.dumps(kwargs)}"
+
+        def register(cache_key: str, args: tuple, kwargs: dict) -> CacheRegistration:
+            registration = cache_registry.get(cache_key)
+            if registration is None:
+                registration = CacheRegistration(
+                    key=key,
+                    ttl=ttl,
+                    stale_ttl=stale_ttl,
+                    refresh=lambda request: _single_flight(
+                        cache_key, lambda: fetch(request, cache_key, args, kwargs)
+                    ),
+                )
+                cache_registry[cache_key] = registration
+            registration.last_requested = time.monotonic()
+            return registration
+
+        def mark_fresh(cache_key: str, fresh_ttl: float) -> None:
+            registration = cache_registry.get(cache_key)
+            if registration is not None:
+                registration.fresh_until = time.monotonic() + fresh_ttl
+
+        def load(cache_key: str, cached_result: bytes) -> BaseModel | None:
+            try:
+                return response_model(**json.loads(cached_result))
+            except ValidationError as e:
+                logger.warning(f"Error parsing cache result for {cache_key}: {e}")
+                return None
+
+        async def save(request: Request, cache_key: str, result: BaseModel) -> None:
+            fresh_ttl = ttl if result_ttl is None else result_ttl(result)
+            serialized = result.model_dump_json()
+            await request.app.state.redis.set(
+                cache_key, serialized, ex=fresh_ttl + stale_ttl
+            )
+            local_cache.set(
+                cache_key,
+                CachedResult.from_body(result, serialized),
+                len(serialized),
+                fresh_ttl + stale_ttl,
+                fresh_ttl=fresh_ttl,
+            )
+            mark_fresh(cache_key, fresh_ttl)
+            await _publish_invalidation(request.app.state.redis, cache_key)
+
+        async def compute(
+            request: Request, cache_key: str, args: tuple, kwargs: dict
+        ) -> BaseModel:
+            result = await func(request=request, *args, **kwargs)
+
+            # Cache the result
+            await save(request, cache_key, result)
+            return result
+
+        async def wait_for_other_worker(
+            request: Request, cache_key: str, lock_key: str
+        ) -> BaseModel | None:
+            redis = request.app.state.redis
+            deadline = asyncio.get_running_loop().time() + lock_ttl
+            while asyncio.get_running_loop().time() < deadline:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+                cached_result = await redis.get(cache_key)
+                if cached_result is not None:
+                    return load(cache_key, cached_result)
+                if not await redis.exists(lock_key):
+                    break
+            return None
+
+        async def fetch(
+            request: Request, cache_key: str, args: tuple, kwargs: dict
+        ) -> BaseModel:
+            if not lock_ttl:
+                return await compute(request, cache_key, args, kwargs)
+
+            lock_key = f"lock:{cache_key}"
+            lock = request.app.state.redis.lock(lock_key, timeout=lock_ttl)
+            if await lock.acquire(blocking=False):
+                try:
+                    return await compute(request, cache_key, args, kwargs)
+                finally:
+                    try:
+                        await lock.release()
+                    except LockError as e:
+                        logger.warning(f"Error releasing {lock_key}: {e}")
+
+            # Another worker is already fetching this key
+            logger.info(f"Waiting for another worker to fetch {cache_key}")
+            result = await wait_for_other_worker(request, cache_key, lock_key)
+            if result is not None:
+                return result
+            return await compute(request, cache_key, args, kwargs)
+
+        async def revalidate(
+            request: Request, cache_key: str, args: tuple, kwargs: dict
+        ) -> None:
+            try:
+                await _single_flight(
+                    cache_key, lambda: fetch(request, cache_key, args, kwargs)
+                )
+            except Exception as e:
+                logger.warning(f"Error revalidating {cache_key}: {e}")
+
+        def schedule_revalidate(
+            request: Request, cache_key: str, args: tuple, kwargs: dict
+        ) -> None:
+            logger.info(f"Serving stale {cache_key}, revalidating")
+            task = asyncio.create_task(revalidate(request, cache_key, args, kwargs))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+
+        async def lookup_key(
+            request: Request, cache_key: str, args: tuple, kwargs: dict
+        ) -> BaseModel | None:
+            # Try to get the result from the in-process cache
+            entry = local_cache.get(cache_key)
+            if entry is not None:
+                cache_stats["l1"]["hits"] += 1
+                stale = entry.stale_at <= time.monotonic()
+                if stale_ttl and stale and cache_key not in _in_flight:
+                    schedule_revalidate(request, cache_key, args, kwargs)
+                return entry.value.model
+            cache_stats["l1"]["misses"] += 1
 
             # Try to get the result from cache
             cached_result = await request.app.state.redis.get(cache_key)
             if cached_result is not None:
                 logger.info("Cache hit")
-                try:
-                    return response_model(**json.loads(cached_result))
-                except ValidationError as e:
+                result = load(cache_key, cached_result)
+                if result is None:
                     # Cache miss, delete the key
-                    logger.warning(f"Error parsing cache result: {e}")
                     await request.app.state.redis.delete(cache_key)
+                else:
+                    cache_stats["l2"]["hits"] += 1
+                    remaining_ttl = await request.app.state.redis.ttl(cache_key)
+                    if remaining_ttl > 0:
+                        mark_fresh(cache_key, remaining_ttl - stale_ttl)
+                        local_cache.set(
+                            cache_key,
+                            CachedResult.from_body(result, cached_result),
+                            len(cached_result),
+                            remaining_ttl,
+                            fresh_ttl=remaining_ttl - stale_ttl,
+                        )
+                    stale = _is_stale(remaining_ttl, stale_ttl)
+                    if stale_ttl and stale and cache_key not in _in_flight:
+                        schedule_revalidate(request, cache_key, args, kwargs)
+                    return result
+            cache_stats["l2"]["misses"] += 1
+            return None
 
-            # Call the original function
-            result = await func(request=request, *args, **kwargs)
+        @wraps(func)
+        async def wrapper(request: Request = Depends(), *args, **kwargs):
+            cache_key = make_key(args, kwargs)
+            register(cache_key, args, kwargs)
 
-            # Cache the result
-            await request.app.state.redis.set(
-                cache_key, result.model_dump_json(), ex=ttl
+            result = await lookup_key(request, cache_key, args, kwargs)
+            if result is not None:
+                return result
+
+            # Call the original function, at most once per key at a time
+            return await _single_flight(
+                cache_key, lambda: fetch(request, cache_key, args, kwargs)
+            )
+
+        async def lookup(request: Request, *args, **kwargs) -> BaseModel | None:
+            return await lookup_key(request, make_key(args, kwargs), args, kwargs)
+
+        async def store(request: Request, result: BaseModel, *args, **kwargs) -> None:
+            await save(request, make_key(args, kwargs), result)
+
+        async def response(request: Request, *args, **kwargs) -> Response:
+            result = await wrapper(request, *args, **kwargs)
+            entry = local_cache.get(make_key(args, kwargs))
+            if entry is not None and entry.value.model is result:
+                cached = entry.value
+            else:
+                # not kept in L1 (e.g. larger than it), serialize it here
+                cached = CachedResult.from_body(result, result.model_dump_json())
+            # keys change before their TTL runs out (store(), revalidation and
+            # invalidation), browsers have to revalidate but get a 304 if unchanged
+            headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+
+            if _etag_matches(request.headers.get("if-none-match"), cached.etag):
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+                )
+            return Response(
+                content=cached.body,
+                media_type="application/json",
+                headers=headers,
             )
-            return result
 
+        wrapper.lookup = lookup
+        wrapper.store = store
+        wrapper.response = response
         return wrapper
 
     return decorator
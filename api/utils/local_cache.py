@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass
+class LocalCacheEntry:
+    value: Any
+    size: int
+    expires_at: float
+    stale_at: float
+
+
+class LocalCache:
+    """Bounded in-process LRU cache with byte-size accounting and per-entry TTLs.
+
+    Entries are evicted least-recently-used first once either ``max_entries`` or
+    ``max_bytes`` is exceeded. ``size`` is supplied by the caller (the length of
+    the serialized value) since the in-memory size of a model is not knowable.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, LocalCacheEntry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: str) -> LocalCacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        size: int,
+        ttl: float,
+        fresh_ttl: float | None = None,
+    ) -> None:
+        self.delete(key)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        now = time.monotonic()
+        fresh_ttl = ttl if fresh_ttl is None else min(fresh_ttl, ttl)
+        self._entries[key] = LocalCacheEntry(
+            value=value, size=size, expires_at=now + ttl, stale_at=now + fresh_ttl
+        )
+        self.size += size
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
@@ -0,0 +1,57 @@
+import logging
+from typing import Awaitable, Callable
+
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+
+async def _load_shared_session(
+    request: Request, key: str, renew_before: int
+) -> str | None:
+    redis = request.app.state.redis
+    session = await redis.get(key)
+    if session is None:
+        return None
+    if renew_before and await redis.ttl(key) <= renew_before:
+        # about to time out, renew it before requests start failing
+        return None
+    return session.decode() if isinstance(session, bytes) else session
+
+
+async def get_shared_session(
+    request: Request,
+    key: str,
+    login: Callable[[], Awaitable[tuple[str, int]]],
+    renew_before: int = 0,
+) -> str:
+    """Return the upstream session shared by all workers through Redis.
+
+    ``login`` is only called if no worker holds a usable session, and returns the
+    new session with the number of seconds it stays valid for. Upstreams such as
+    DSM and Pi-hole only allow a few sessions, so logins are serialized by a lock.
+    """
+    session = await _load_shared_session(request, key, renew_before)
+    if session is not None:
+        return session
+
+    redis = request.app.state.redis
+    async with redis.lock(f"lock:{key}", timeout=30, blocking_timeout=30):
+        # another worker may have logged in while we waited for the lock
+        session = await _load_shared_session(request, key, renew_before)
+        if session is not None:
+            return session
+        session, ttl = await login()
+        await redis.set(key, session, ex=ttl)
+        return session
+
+
+async def forget_shared_session(request: Request, key: str, session: str) -> None:
+    """Drop a session the upstream rejected, so the next caller logs in again."""
+    redis = request.app.state.redis
+    current_session = await redis.get(key)
+    if isinstance(current_session, bytes):
+        current_session = current_session.decode()
+    # only drop it if nobody has replaced it with a fresh login already
+    if current_session == session:
+        await redis.delete(key)
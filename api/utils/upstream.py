@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from typing import Any
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=30.0,
+)
+DEFAULT_PER_HOST_LIMIT = 10
+
+
+class UpstreamClient:
+    """Shared, connection-pooled async HTTP client for all upstream APIs.
+
+    Holds two pooled ``httpx.AsyncClient`` instances (one verifying TLS and one
+    that does not, for the self-signed NAS and Pi-hole certificates) and caps
+    the number of in-flight requests per host so one upstream cannot starve
+    the connection pool. Redirects are followed, as they were with ``requests``.
+    """
+
+    def __init__(
+        self,
+        timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+        limits: httpx.Limits = DEFAULT_LIMITS,
+        per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+        host_limits: dict[str, int] | None = None,
+        **client_kwargs: Any,
+    ):
+        client_kwargs.setdefault("follow_redirects", True)
+        self._client = httpx.AsyncClient(
+            timeout=timeout, limits=limits, **client_kwargs
+        )
+        self._insecure_client = httpx.AsyncClient(
+            timeout=timeout, limits=limits, verify=False, **client_kwargs
+        )
+        self._per_host_limit = per_host_limit
+        self._host_limits = host_limits or {}
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = httpx.URL(url).host
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            limit = self._host_limits.get(host, self._per_host_limit)
+            semaphore = asyncio.Semaphore(limit)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    async def request(
+        self, method: str, url: str, verify: bool = True, **kwargs: Any
+    ) -> httpx.Response:
+        client = self._client if verify else self._insecure_client
+        async with self._host_semaphore(url):
+            return await client.request(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("DELETE", url, **kwargs)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+        await self._insecure_client.aclose()
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import random
+import time
+
+from fastapi import FastAPI, Request
+
+from api.utils.cache import CacheRegistration, cache_registry
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    """Refreshes every requested cache key shortly before its TTL expires.
+
+    Keys are refreshed ``lead`` seconds early (a fraction of the TTL, plus
+    jitter so keys with equal TTLs do not refresh in lockstep). A failing
+    upstream backs off exponentially per source (the cache key prefix, e.g.
+    ``nas``) and keys nobody has requested for ``idle_timeout`` are dropped.
+    """
+
+    def __init__(
+        self,
+        app: FastAPI,
+        concurrency: int = 4,
+        tick: float = 1.0,
+        lead_fraction: float = 0.1,
+        max_lead: float = 30.0,
+        min_backoff: float = 5.0,
+        max_backoff: float = 60.0 * 15,
+        idle_timeout: float = 60.0 * 60,
+    ):
+        self.app = app
+        self.tick = tick
+        self.lead_fraction = lead_fraction
+        self.max_lead = max_lead
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.idle_timeout = idle_timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: dict[str, asyncio.Task] = {}
+        # cache key -> (fresh_until it was drawn for, jitter)
+        self._jitter: dict[str, tuple[float, float]] = {}
+        # cache key -> earliest time of the next attempt
+        self._not_before: dict[str, float] = {}
+        # source -> (consecutive failures, backing off until)
+        self._backoff: dict[str, tuple[int, float]] = {}
+
+    def _request(self) -> Request:
+        return Request({"type": "http", "app": self.app, "headers": []})
+
+    def _lead(self, registration: CacheRegistration) -> float:
+        return min(registration.ttl * self.lead_fraction, self.max_lead)
+
+    def _refresh_at(self, cache_key: str, registration: CacheRegistration) -> float:
+        lead = self._lead(registration)
+        drawn_for, jitter = self._jitter.get(cache_key, (None, 0.0))
+        if drawn_for != registration.fresh_until:
+            jitter = random.uniform(0, lead / 2)
+            self._jitter[cache_key] = (registration.fresh_until, jitter)
+        return registration.fresh_until - lead - jitter
+
+    def _forget(self, cache_key: str) -> None:
+        cache_registry.pop(cache_key, None)
+        self._jitter.pop(cache_key, None)
+        self._not_before.pop(cache_key, None)
+
+    def due(self, now: float) -> list[tuple[str, CacheRegistration]]:
+        due: list[tuple[str, CacheRegistration]] = []
+        for cache_key, registration in list(cache_registry.items()):
+            idle_timeout = max(self.idle_timeout, 2 * registration.ttl)
+            if now - registration.last_requested > idle_timeout:
+                logger.info(f"No longer warming idle {cache_key}")
+                self._forget(cache_key)
+                continue
+            if cache_key in self._tasks:
+                continue
+            if now < self._not_before.get(cache_key, 0.0):
+                continue
+            if now < self._backoff.get(registration.source, (0, 0.0))[1]:
+                continue
+            if now >= self._refresh_at(cache_key, registration):
+                due.append((cache_key, registration))
+        return due
+
+    async def refresh(self, cache_key: str, registration: CacheRegistration) -> None:
+        async with self._semaphore:
+            try:
+                # fresh_until only follows this worker's own saves, skip keys
+                # another worker has refreshed in the meantime
+                remaining_ttl = await self.app.state.redis.ttl(cache_key)
+                fresh_ttl = remaining_ttl - registration.stale_ttl
+                if remaining_ttl > 0 and fresh_ttl > self._lead(registration):
+                    registration.fresh_until = time.monotonic() + fresh_ttl
+                    return
+                await registration.refresh(self._request())
+            except Exception as e:
+                failures = self._backoff.get(registration.source, (0, 0.0))[0] + 1
+                delay = min(self.min_backoff * 2 ** (failures - 1), self.max_backoff)
+                self._backoff[registration.source] = (
+                    failures,
+                    time.monotonic() + delay,
+                )
+                logger.warning(
+                    f"Error warming {cache_key}, backing off "
+                    f"{registration.source} for {delay}s: {e}"
+                )
+            else:
+                self._backoff.pop(registration.source, None)
+            finally:
+                # another worker may have refreshed it, don't retry immediately
+                self._not_before[cache_key] = time.monotonic() + max(
+                    self._lead(registration), self.tick
+                )
+
+    def _start_refresh(self, cache_key: str, registration: CacheRegistration) -> None:
+        task = asyncio.create_task(self.refresh(cache_key, registration))
+        self._tasks[cache_key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(cache_key, None))
+
+    async def run(self) -> None:
+        while True:
+            for cache_key, registration in self.due(time.monotonic()):
+                self._start_refresh(cache_key, registration)
+            await asyncio.sleep(self.tick)
+
+    async def aclose(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
@@ -40,34 +40,44 @@ function NasDiagnosticsTableRow() {
 		);
 	}
 
-	const cpuMax: number = Math.max(...Object.values(data.utilization.cpu));
-	const cpuAvg: number =
-		Object.values(data.utilization.cpu).reduce((acc, c) => acc + c, 0) /
-		Object.values(data.utilization.cpu).length;
-	const memoryUsage: number = data.utilization.memory.real_usage;
-	const diskUsageBytes: number = data.storage.vol_info.reduce(
-		(acc, v) => acc + v.used_size,
-		0
-	);
-	const diskCapacityBytes: number = data.storage.vol_info.reduce(
-		(acc, v) => acc + v.total_size,
-		0
-	);
-	const diskUsageTB: string = `${bytesToTerabytes(diskUsageBytes).toFixed(2)} TB`;
-	const diskCapacityTB: string = `${bytesToTerabytes(diskCapacityBytes).toFixed(2)} TB`;
-	const diskUsagePercent: number = (diskUsageBytes / diskCapacityBytes) * 100;
+	// sections the NAS failed to return are null, their cells show a dash
+	const cpu = data.utilization && Object.values(data.utilization.cpu);
+	const cpuMax = cpu && `${Math.max(...cpu).toFixed(2)}%`;
+	const cpuAvg =
+		cpu && `${(cpu.reduce((acc, c) => acc + c, 0) / cpu.length).toFixed(2)}%`;
+	const memoryUsage =
+		data.utilization &&
+		`${data.utilization.memory.real_usage.toFixed(1)}%`;
+
+	let diskUsage: string | null = null;
+	if (data.storage) {
+		const diskUsageBytes: number = data.storage.vol_info.reduce(
+			(acc, v) => acc + v.used_size,
+			0
+		);
+		const diskCapacityBytes: number = data.storage.vol_info.reduce(
+			(acc, v) => acc + v.total_size,
+			0
+		);
+		const diskUsageTB: string = `${bytesToTerabytes(diskUsageBytes).toFixed(2)} TB`;
+		const diskCapacityTB: string = `${bytesToTerabytes(diskCapacityBytes).toFixed(2)} TB`;
+		const diskUsagePercent: number =
+			(diskUsageBytes / diskCapacityBytes) * 100;
+		diskUsage = `${diskUsageTB} / ${diskCapacityTB} (${diskUsagePercent.toFixed(
+			1
+		)}%)`;
+	}
+	const temperature =
+		data.core &&
+		`${celsiusToFahrenheit(data.core.sys_temp).toFixed(1)}°F`;
 
 	return (
 		<>
-			<TableCell align="right">{`${cpuMax.toFixed(2)}%`}</TableCell>
-			<TableCell align="right">{`${cpuAvg.toFixed(2)}%`}</TableCell>
-			<TableCell align="right">{`${memoryUsage.toFixed(1)}%`}</TableCell>
-			<TableCell align="right">{`${diskUsageTB} / ${diskCapacityTB} (${diskUsagePercent.toFixed(
-				1
-			)}%)`}</TableCell>
-			<TableCell align="right">
-				{`${celsiusToFahrenheit(data.core.sys_temp).toFixed(1)}°F`}
-			</TableCell>
+			<TableCell align="right">{cpuMax ?? '-'}</TableCell>
+			<TableCell align="right">{cpuAvg ?? '-'}</TableCell>
+			<TableCell align="right">{memoryUsage ?? '-'}</TableCell>
+			<TableCell align="right">{diskUsage ?? '-'}</TableCell>
+			<TableCell align="right">{temperature ?? '-'}</TableCell>
 		</>
 	);
 }
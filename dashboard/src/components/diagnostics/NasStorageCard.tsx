@@ -129,6 +129,14 @@ function NasStorageCardContent() {
 		);
 	}
 
+	if (!data.storage) {
+		return (
+			<Typography color="error" sx={{ py: 2 }}>
+				NAS storage data is currently unavailable
+			</Typography>
+		);
+	}
+
 	const hdds = data.storage.hdd_info;
 	// Use volume info for accurate capacity calculations (accounts for RAID)
 	const totalUsedBytes = data.storage.vol_info.reduce(
@@ -9,6 +9,10 @@ from pydantic import BaseModel
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+SPEEDTEST_KEY = "speedtest"
+# the API's cache update channel (api/utils/cache.py), messages are "<sender> <key>"
+INVALIDATION_CHANNEL = "cache:invalidate"
+
 
 class ServerModel(BaseModel):
     url: str
@@ -59,6 +63,12 @@ def speedtest() -> SpeedTestModel:
     return SpeedTestModel(**json_data)
 
 
+def save_result(cache: redis.Redis, result: str, interval: int) -> None:
+    cache.set(SPEEDTEST_KEY, result, ex=interval * 2)
+    # let the API stream the new result to its /stream/ subscribers
+    cache.publish(INVALIDATION_CHANNEL, f"speedtest {SPEEDTEST_KEY}")
+
+
 def main(interval: int) -> None:
     logger.info("Starting up...")
     cache = redis.Redis(host="cache", port=6379, db=0)
@@ -74,7 +84,7 @@ def main(interval: int) -> None:
             logger.info(result)
 
             # cache the results
-            cache.set("speedtest", result, ex=interval * 2)
+            save_result(cache, result, interval)
 
             time.sleep(interval)
 
@@ -4,7 +4,7 @@ from unittest.mock import MagicMock, patch
 import pytest
 from pydantic import ValidationError
 
-from main import SpeedTestModel, speedtest
+from main import INVALIDATION_CHANNEL, SpeedTestModel, save_result, speedtest
 
 
 class TestSpeedTestModel:
@@ -170,3 +170,20 @@ class TestSpeedtestFunction:
             speedtest()
 
         assert "Error: Could not connect to server" in str(exc_info.value)
+
+
+class TestSaveResult:
+    """Test caching a speedtest result"""
+
+    def test_save_result_notifies_api(self):
+        """Test the result is cached and announced on the API's update channel"""
+        mock_cache = MagicMock()
+
+        save_result(mock_cache, '{"download": 1.0}', interval=600)
+
+        mock_cache.set.assert_called_once_with(
+            "speedtest", '{"download": 1.0}', ex=1200
+        )
+        mock_cache.publish.assert_called_once_with(
+            INVALIDATION_CHANNEL, "speedtest speedtest"
+        )